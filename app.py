@@ -2,6 +2,7 @@ import dash
 from dash import dcc, html
 import dash_bootstrap_components as dbc
 import logging
+import uuid
 
 # Initialize Dash app with Bootstrap theme and pages support
 app = dash.Dash(__name__, 
@@ -13,45 +14,55 @@ app = dash.Dash(__name__,
 # Define the main layout with navigation
 logging.basicConfig(level=logging.INFO)
 
-app.layout = dbc.Container([
-    # Navigation bar
-    dbc.Navbar(
-        dbc.Container([
-            dbc.Row([
-                dbc.Col([
-                    dbc.NavbarBrand("CNC Pen Plotter Control", className="text-white"),
-                ], width=6),
-                dbc.Col([
-                    dbc.Badge("Ready", color="success", id="status-badge", className="float-end mt-2"),
-                ], width=6),
-            ], className="w-100"),
-        ]),
-        color="dark",
-        dark=True,
-        className="mb-3"
-    ),
+def serve_layout():
+    """Build the page layout, with a fresh session id for every page load."""
+    return dbc.Container([
+        # Navigation bar
+        dbc.Navbar(
+            dbc.Container([
+                dbc.Row([
+                    dbc.Col([
+                        dbc.NavbarBrand("CNC Pen Plotter Control", className="text-white"),
+                    ], width=6),
+                    dbc.Col([
+                        dbc.Badge("Ready", color="success", id="status-badge", className="float-end mt-2"),
+                    ], width=6),
+                ], className="w-100"),
+            ]),
+            color="dark",
+            dark=True,
+            className="mb-3"
+        ),
     
-    # Navigation links
-    dbc.Nav([
-        dbc.NavItem(dbc.NavLink("Image Processing", href="/", active="exact")),
-        dbc.NavItem(dbc.NavLink("Generative Art", href="/generate", active="exact")),
-        dbc.NavItem(dbc.NavLink("Plot Settings", href="/settings", active="exact")),
-    ], pills=True, className="mb-3"),
+        # Navigation links
+        dbc.Nav([
+            dbc.NavItem(dbc.NavLink("Image Processing", href="/", active="exact")),
+            dbc.NavItem(dbc.NavLink("Generative Art", href="/generate", active="exact")),
+            dbc.NavItem(dbc.NavLink("Plot Settings", href="/settings", active="exact")),
+        ], pills=True, className="mb-3"),
     
-    # Page content will be inserted here
-    dash.page_container,
+        # Page content will be inserted here
+        dash.page_container,
     
-    # Global stores for shared data
-    dcc.Store(id='global-image-data'),
-    dcc.Store(id='global-processed-data'),
-    dcc.Store(id='global-gcode-data'),
-    dcc.Store(id='global-svg-data'),
+        # Global stores for shared data
+        dcc.Store(id='global-image-data'),  # image store key, not pixels
+        dcc.Store(id='global-processed-data'),
+        dcc.Store(id='global-gcode-data'),
+        dcc.Store(id='global-svg-data'),
+        dcc.Store(id='job-key'),  # current job in the server-side job store, shared by every page
+        dcc.Store(id='session-id', data=uuid.uuid4().hex),  # keys this tab's pipeline runs
     
-    # Hidden download components
-    dcc.Download(id="global-download-gcode"),
-    dcc.Download(id="global-download-svg"),
+        # Hidden download components
+        dcc.Download(id="global-download-svg"),
     
-], fluid=True)
+    ], fluid=True)
+
+
+app.layout = serve_layout
+
+# Plain Flask routes, e.g. streamed G-code downloads
+from src.routes import register_routes
+register_routes(app.server)
 
 # Import callbacks to register them
 import src.callbacks  # global callbacks
@@ -1,45 +1,73 @@
 """Global callbacks for the CNC Pen Plotter application."""
 import logging
-from dash import Input, Output, callback
+from dash import Input, Output, State, callback
 from dash.exceptions import PreventUpdate
 
-from src.utils.plotting import generate_gcode, generate_svg, create_download_data
+from src.routes import ARC_TOLERANCE_RANGE, GCODE_PRECISION_RANGE, clamp, gcode_url
+from src.utils.jobs import job_store
+from src.utils.plotting import generate_svg, create_download_data
 from src.constants import DEFAULT_PLOT_SETTINGS
 
 logger = logging.getLogger(__name__)
 
 
 @callback(
-    Output("global-download-gcode", "data"),
-    Input("download-gcode-btn", "n_clicks"),
-    prevent_initial_call=True,
+    Output("download-gcode-btn", "href"),
+    Output("download-gcode-btn", "disabled"),
+    Output("gcode-report", "children"),
+    Input("job-key", "data"),
+    Input("gcode-format", "value"),
+    Input("gcode-precision", "value"),
+    Input("arc-tolerance", "value"),
 )
-def download_gcode_global(n_clicks: int):
-    """Generate and download G-code file globally."""
-    if not n_clicks:
-        raise PreventUpdate
+def update_gcode_link(
+    job_key: str | None, gcode_format: list[str], precision: int | None, arc_tolerance: float | None,
+):
+    """Point the G-code button at the streamed download of the current job.
 
-    # TODO: Replace mock paths and settings with values from stores
-    paths = [(0, 0), (100, 100), (200, 50)]
-    plot_settings = DEFAULT_PLOT_SETTINGS
+    With arc fitting on, also report how many moves it removes and how much
+    shorter the program gets. Both come from the fit's counts, which the
+    download reuses, so no G-code is generated here.
+    """
+    if not job_key:
+        return None, True, ""
+    gcode_format = gcode_format or []
+    options = dict(
+        compact='compact' in gcode_format,
+        precision=3 if precision is None else clamp(precision, GCODE_PRECISION_RANGE),
+        relative='relative' in gcode_format,
+    )
+    if 'arcs' not in gcode_format or not arc_tolerance:
+        return gcode_url(job_key, **options), False, ""
 
-    logger.info("Generating G-code for %d paths", len(paths))
-    gcode = generate_gcode(paths, plot_settings)
-    return create_download_data(gcode, "gcode")
+    arc_tolerance = clamp(arc_tolerance, ARC_TOLERANCE_RANGE)
+    paths = job_store.get(job_key)
+    fitted = job_store.arcs(job_key, arc_tolerance)
+    if paths is None or fitted is None:
+        return None, True, "Job expired, please regenerate it"
+    stats = fitted[1]
+    # One line per vertex plus a pen drop and lift per path; the header is left out.
+    lines_before = stats.moves_before + 2 * len(paths)
+    report = (
+        f"Arc fitting: {stats.arcs} arcs remove {stats.moves_removed} of {stats.moves_before} moves"
+        f" | G-code: {stats.moves_removed / max(lines_before, 1):.0%} fewer lines"
+    )
+    return gcode_url(job_key, arc_tolerance=arc_tolerance, **options), False, report
 
 
 @callback(
     Output("global-download-svg", "data"),
     Input("download-svg-btn", "n_clicks"),
+    State("job-key", "data"),
     prevent_initial_call=True,
 )
-def download_svg_global(n_clicks: int):
+def download_svg_global(n_clicks: int, job_key: str | None):
     """Generate and download SVG file globally."""
-    if not n_clicks:
+    paths = job_store.get(job_key) if job_key else None
+    if not n_clicks or paths is None:
         raise PreventUpdate
 
-    # TODO: Replace mock paths and settings with values from stores
-    paths = [(0, 0), (100, 100), (200, 50)]
+    # TODO: Replace default settings with values from the settings page
     plot_settings = DEFAULT_PLOT_SETTINGS
 
     logger.info("Generating SVG for %d paths", len(paths))
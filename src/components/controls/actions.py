@@ -2,6 +2,8 @@
 from dash import html
 import dash_bootstrap_components as dbc
 
+from src.utils.arcs import ARC_TOLERANCE_MM
+
 
 def create_action_buttons() -> dbc.Card:
     """Create action buttons."""
@@ -12,7 +14,8 @@ def create_action_buttons() -> dbc.Card:
                     dbc.Button("Process Image", id='process-btn', color="primary", className="w-100"),
                 ], width=3),
                 dbc.Col([
-                    dbc.Button("Download G-Code", id='download-gcode-btn', color="success", className="w-100"),
+                    dbc.Button("Download G-Code", id='download-gcode-btn', color="success", className="w-100",
+                               external_link=True, disabled=True),
                 ], width=3),
                 dbc.Col([
                     dbc.Button("Download SVG", id='download-svg-btn', color="success", className="w-100"),
@@ -22,6 +25,35 @@ def create_action_buttons() -> dbc.Card:
                                disabled=True),
                 ], width=3),
             ]),
+            dbc.Row([
+                dbc.Col([
+                    dbc.Checklist(
+                        id='gcode-format',
+                        options=[
+                            {"label": "Compact G-code", "value": "compact"},
+                            {"label": "Relative moves", "value": "relative"},
+                            {"label": "Fit arcs", "value": "arcs"},
+                        ],
+                        value=[],
+                        inline=True,
+                        switch=True,
+                    ),
+                ], width=6),
+                dbc.Col([
+                    dbc.InputGroup([
+                        dbc.InputGroupText("Decimals"),
+                        dbc.Input(id='gcode-precision', type='number', value=3, min=0, max=6, step=1),
+                    ], size="sm"),
+                ], width=3),
+                dbc.Col([
+                    dbc.InputGroup([
+                        dbc.InputGroupText("Arc tol. (mm)"),
+                        dbc.Input(id='arc-tolerance', type='number', value=ARC_TOLERANCE_MM, min=0.001, max=1,
+                                  step=0.005),
+                    ], size="sm"),
+                ], width=3),
+            ], className="mt-2"),
+            html.Div(id='gcode-report', className="small text-muted mt-1"),
             dbc.Progress(id='progress-bar', value=0, className="mt-3", style={'height': '20px'}),
             html.Div(id='status-message', className="mt-2 text-center"),
         ])
@@ -48,6 +48,25 @@ def create_generative_controls() -> dbc.Card:
                 color="primary",
                 className="w-100 mt-3",
             ),
+
+            html.Hr(),
+            dbc.Label("Seed Sweep"),
+            dbc.InputGroup([
+                dbc.InputGroupText("Seeds"),
+                dbc.Input(id='sweep-count', type='number', value=8, min=1, max=64, step=1),
+            ], size="sm"),
+            dbc.Label("Complexity Range", className="mt-2"),
+            dcc.RangeSlider(
+                id='sweep-complexity',
+                min=1, max=10, value=[5, 5], step=1,
+                marks={1: '1', 5: '5', 10: '10'},
+            ),
+            dbc.Button(
+                "Sweep Seeds",
+                id='sweep-btn',
+                color="secondary",
+                className="w-100 mt-2",
+            ),
         ])
     ], className="mt-3")
 
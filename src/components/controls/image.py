@@ -1,7 +1,7 @@
 """Image filter control components."""
 from dash import dcc, html
 import dash_bootstrap_components as dbc
-from src.constants import EDGE_DETECTION_METHODS, VECTORIZATION_METHODS
+from src.constants import EDGE_DETECTION_METHODS, SIMPLIFICATION_METHODS, VECTORIZATION_METHODS
 
 
 def create_image_filter_controls() -> dbc.Card:
@@ -108,6 +108,36 @@ def create_image_filter_controls() -> dbc.Card:
                     marks={0: '0°', 45: '45°', 90: '90°', 135: '135°', 180: '180°'},
                     tooltip={"placement": "bottom", "always_visible": False}
                 ),
+
+                dbc.Checklist(
+                    id='hatch-link',
+                    options=[{"label": "Link hatch lines (zig-zag)", "value": 1}],
+                    value=[1],
+                    className="mt-2",
+                ),
+
+                dbc.Label("Stipple Points", className="mt-2"),
+                dcc.Slider(
+                    id='stipple-points',
+                    min=1000, max=20000, value=5000, step=1000,
+                    marks={1000: '1k', 10000: '10k', 20000: '20k'},
+                    tooltip={"placement": "bottom", "always_visible": False}
+                ),
+
+                dbc.Label("Simplify", className="mt-2"),
+                dcc.Dropdown(
+                    id='simplify-method',
+                    options=[{'label': v, 'value': k} for k, v in SIMPLIFICATION_METHODS.items()],
+                    value='rdp',
+                    clearable=False,
+                ),
+
+                dbc.Checklist(
+                    id='cleanup-paths',
+                    options=[{"label": "Join fragments and remove double strokes", "value": 1}],
+                    value=[1],
+                    className="mt-2",
+                ),
             ], id={'type': 'collapse', 'index': 'vector'}, is_open=False),
         ])
     ], className="mt-3")
@@ -19,6 +19,12 @@ def create_plot_settings() -> dbc.Card:
             dbc.Label("Feed Rate (mm/min)", className="mt-2"),
             dbc.Input(id='feed-rate', type='number', value=settings.feed_rate, min=100, max=5000),
 
+            dbc.Label("Travel Rate (mm/min)", className="mt-2"),
+            dbc.Input(id='travel-rate', type='number', value=settings.travel_rate, min=100, max=20000),
+
+            dbc.Label("Acceleration (mm/s²)", className="mt-2"),
+            dbc.Input(id='acceleration', type='number', value=settings.acceleration, min=10, max=10000),
+
             dbc.Label("Pen Lift Height (mm)", className="mt-2"),
             dbc.Input(id='pen-lift', type='number', value=settings.pen_lift_height, min=1, max=20),
         ])
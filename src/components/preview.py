@@ -26,6 +26,12 @@ def create_preview_section():
                     ),
                 ], width=6),
             ]),
+            dcc.Graph(
+                id='toolpath-preview',
+                config={'displayModeBar': False, 'scrollZoom': True},
+                style={'height': '500px'}
+            ),
+            dcc.Store(id='toolpath-key'),
             html.Hr(),
             dbc.Row([
                 dbc.Col([
@@ -37,9 +43,12 @@ def create_preview_section():
 
 
 def create_single_preview():
-    """Create a single preview graph."""
-    return dcc.Graph(
-        id='main-preview',
-        config={'displayModeBar': False},
-        style={'height': '600px'}
-    )
+    """Create a single toolpath preview graph."""
+    return html.Div([
+        dcc.Graph(
+            id='main-preview',
+            config={'displayModeBar': False, 'scrollZoom': True},
+            style={'height': '600px'}
+        ),
+        dcc.Store(id='gen-variant'),
+    ])
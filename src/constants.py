@@ -8,7 +8,10 @@ class PlotSettings:
     width: int = 100  # mm
     height: int = 100  # mm
     feed_rate: int = 1000  # mm/min
+    travel_rate: int = 3000  # mm/min
+    acceleration: float = 500.0  # mm/s^2
     pen_lift_height: int = 5  # mm
+    stroke_width: float = 0.5  # mm
 
 
 @dataclass
@@ -23,6 +26,10 @@ class ImageSettings:
     vector_method: str = 'contour'
     hatch_spacing: int = 5
     hatch_angle: int = 45
+    hatch_link: bool = True
+    stipple_points: int = 5000
+    simplify_method: str = 'rdp'
+    cleanup_paths: bool = True
 
 
 @dataclass
@@ -55,6 +62,13 @@ VECTORIZATION_METHODS = {
     'stipple': 'TSP Stippling',
 }
 
+# Polyline simplification methods
+SIMPLIFICATION_METHODS = {
+    'none': 'None',
+    'rdp': 'Ramer–Douglas–Peucker',
+    'visvalingam': 'Visvalingam–Whyatt',
+}
+
 # Edge detection methods
 EDGE_DETECTION_METHODS = {
     'none': 'None',
@@ -1,6 +1,6 @@
 """Generate page - Generative art workflow for the CNC Pen Plotter application."""
 import dash
-from dash import html
+from dash import dcc, html
 import dash_bootstrap_components as dbc
 
 from src.components.controls import create_generative_controls, create_action_buttons
@@ -28,6 +28,13 @@ layout = dbc.Container([
                     html.Div(id='gen-path-stats', className="text-muted"),
                 ])
             ]),
+            dbc.Card([
+                dbc.CardHeader("Seed Sweep"),
+                dbc.CardBody([
+                    dcc.Loading(html.Div(id='sweep-grid', className="text-muted")),
+                    dcc.Store(id='sweep-variants'),
+                ])
+            ], className="mt-3"),
             create_action_buttons(),
         ], width=8),
     ]),
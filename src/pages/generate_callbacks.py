@@ -1,11 +1,18 @@
 """Callbacks for the generative art page."""
+import base64
 import logging
+from dataclasses import asdict
+
 import numpy as np
-from dash import Input, Output, State, callback
+import dash_bootstrap_components as dbc
+from dash import ALL, Input, Output, State, callback, ctx, html
+from dash.exceptions import PreventUpdate
 
-from src.utils.generative_art import generate_art
-from src.utils.image_processing import extract_paths
-from src.utils.plotting import create_image_figure, create_empty_figure
+from src.constants import DEFAULT_PLOT_SETTINGS
+from src.utils.jobs import job_store
+from src.utils.kinematics import estimate_job
+from src.utils.plotting import create_empty_figure, create_toolpath_figure, view_from_relayout
+from src.utils.sweep import Variant, render_variant, sweep_variants
 
 logger = logging.getLogger(__name__)
 
@@ -17,17 +24,20 @@ logger = logging.getLogger(__name__)
 )
 def randomize_seed(n_clicks: int) -> int:
     """Generate a random seed for reproducibility."""
-    return int(np.random.randint(0, 10000))
+    return int(np.random.default_rng().integers(0, 10000))
 
 
 @callback(
     Output('main-preview', 'figure'),
     Output('gen-path-stats', 'children'),
+    Output('gen-variant', 'data'),
+    Output('job-key', 'data', allow_duplicate=True),
     Input('generate-btn', 'n_clicks'),
     State('gen-algorithm', 'value'),
     State('random-seed', 'value'),
     State('complexity-slider', 'value'),
     State('scale-slider', 'value'),
+    prevent_initial_call='initial_duplicate',
 )
 def generate_and_preview(
     n_clicks: int | None,
@@ -38,16 +48,108 @@ def generate_and_preview(
 ):
     """Generate art and create preview."""
     if not n_clicks:
-        return create_empty_figure(), "Click 'Generate Art' to create artwork"
+        return create_empty_figure(), "Click 'Generate Art' to create artwork", None, None
 
     try:
-        np.random.seed(seed)
-        generated_img = generate_art(algorithm, complexity, scale)
-        paths = extract_paths(generated_img, 'contour')
-        stats = f"Algorithm: {algorithm} | Paths: {len(paths)} | Est. time: {len(paths) * 2} seconds"
-        fig = create_image_figure(generated_img, f"Generated Art - {algorithm}")
-        return fig, stats
+        variant = Variant(algorithm, seed or 0, complexity, scale)
+        result = render_variant(variant)
+        paths, order_stats = result.paths, result.order_stats
+        estimate = estimate_job(paths, DEFAULT_PLOT_SETTINGS)
+        stats = (
+            f"Algorithm: {algorithm} | Paths: {len(paths)} | Est. time: {estimate.duration_text}"
+            f" | Drawing: {estimate.draw_distance:.0f}mm | Pen lifts: {estimate.pen_lifts}"
+            f" | Pen-up travel: {order_stats.travel_before:.0f}mm → {order_stats.travel_after:.0f}mm"
+        )
+        fig = create_toolpath_figure(paths, DEFAULT_PLOT_SETTINGS)
+        fig.update_layout(title=f"Generated Art - {algorithm}")
+        return fig, stats, asdict(variant), job_store.put(paths)
     except Exception as exc:  # pragma: no cover - placeholder
         logger.error("Generative art failed: %s", exc)
-        return create_empty_figure(), f"Error: {exc}"
+        return create_empty_figure(), f"Error: {exc}", None, None
+
+
+@callback(
+    Output('main-preview', 'figure', allow_duplicate=True),
+    Input('main-preview', 'relayoutData'),
+    State('gen-variant', 'data'),
+    prevent_initial_call=True,
+)
+def refine_preview(relayout: dict | None, variant: dict | None):
+    """Redraw the toolpath preview at the detail of the zoomed-in window."""
+    view = view_from_relayout(relayout)
+    if not variant or (view is None and not (relayout or {}).get('xaxis.autorange')):
+        raise PreventUpdate
+    result = render_variant(Variant(**variant))
+    fig = create_toolpath_figure(result.paths, DEFAULT_PLOT_SETTINGS, view)
+    fig.update_layout(title=f"Generated Art - {variant['algorithm']}")
+    return fig
+
+
+@callback(
+    Output('sweep-grid', 'children'),
+    Output('sweep-variants', 'data'),
+    Input('sweep-btn', 'n_clicks'),
+    State('gen-algorithm', 'value'),
+    State('random-seed', 'value'),
+    State('sweep-count', 'value'),
+    State('sweep-complexity', 'value'),
+    State('scale-slider', 'value'),
+    prevent_initial_call=True,
+)
+def sweep_seeds(
+    n_clicks: int | None,
+    algorithm: str,
+    seed: int,
+    count: int,
+    complexity_range: list[int],
+    scale: float,
+):
+    """Generate a thumbnail grid of consecutive seeds across a complexity range."""
+    if not n_clicks:
+        raise PreventUpdate
+
+    low, high = complexity_range
+    variants = [
+        Variant(algorithm, (seed or 0) + i, complexity, scale)
+        for complexity in range(low, high + 1)
+        for i in range(count or 1)
+    ]
+    try:
+        results = sweep_variants(variants)
+    except Exception as exc:  # pragma: no cover - placeholder
+        logger.error("Seed sweep failed: %s", exc)
+        return f"Error: {exc}", []
+
+    thumbnails = [
+        dbc.Col(
+            html.Div([
+                html.Img(
+                    src="data:image/png;base64," + base64.b64encode(result.thumbnail).decode(),
+                    className="img-fluid border",
+                ),
+                html.Small(f"Seed {variant.seed} · Complexity {variant.complexity}"),
+            ], id={'type': 'sweep-thumb', 'index': i}, n_clicks=0, role="button", className="text-center"),
+            width=3,
+        )
+        for i, (variant, result) in enumerate(zip(variants, results))
+    ]
+    return dbc.Row(thumbnails, className="g-2"), [asdict(variant) for variant in variants]
+
 
+@callback(
+    Output('gen-algorithm', 'value'),
+    Output('random-seed', 'value', allow_duplicate=True),
+    Output('complexity-slider', 'value'),
+    Output('scale-slider', 'value'),
+    Output('generate-btn', 'n_clicks'),
+    Input({'type': 'sweep-thumb', 'index': ALL}, 'n_clicks'),
+    State('sweep-variants', 'data'),
+    State('generate-btn', 'n_clicks'),
+    prevent_initial_call=True,
+)
+def promote_variant(thumb_clicks: list[int], variants: list[dict], n_clicks: int | None):
+    """Load a clicked thumbnail's settings and regenerate it, from cache, as the main preview."""
+    if not ctx.triggered_id or not any(thumb_clicks):
+        raise PreventUpdate
+    variant = variants[ctx.triggered_id['index']]
+    return variant['algorithm'], variant['seed'], variant['complexity'], variant['scale'], (n_clicks or 0) + 1
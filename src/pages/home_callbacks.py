@@ -1,14 +1,17 @@
 """Callbacks for the home (image processing) page."""
 import base64
-import io
+import functools
 import logging
-from dash import Input, Output, State, callback, MATCH, html
+from dash import Input, Output, State, callback, ctx, MATCH, html, no_update
 import dash_bootstrap_components as dbc
 from dash.exceptions import PreventUpdate
-from PIL import Image
 
-from src.utils.image_processing import apply_filters, extract_paths
-from src.utils.plotting import create_image_figure, create_empty_figure
+from src.constants import DEFAULT_PLOT_SETTINGS
+from src.utils import pipeline
+from src.utils.image_store import image_store
+from src.utils.jobs import job_store
+from src.utils.kinematics import estimate_job
+from src.utils.plotting import create_empty_figure, create_toolpath_figure, view_from_relayout
 
 logger = logging.getLogger(__name__)
 
@@ -20,31 +23,47 @@ logger = logging.getLogger(__name__)
     State('upload-image', 'filename')
 )
 def upload_image(contents: str | None, filename: str | None):
-    """Handle image upload."""
+    """Decode an upload into the server-side image store and keep only its key."""
     if contents is None:
         raise PreventUpdate
 
     try:
         content_type, content_string = contents.split(',')
-        base64.b64decode(content_string)
-        return contents, dbc.Alert(f"Uploaded: {filename}", color="success")
+        key = image_store.put(base64.b64decode(content_string))
+        return key, dbc.Alert(f"Uploaded: {filename}", color="success")
     except Exception as exc:  # pragma: no cover - placeholder
         logger.error("Failed to upload image: %s", exc)
         return None, dbc.Alert(f"Error: {exc}", color="danger")
 
 
+# Sliders whose drag_value drives the low-resolution proxy preview.
+_DRAG_SLIDERS = ('brightness-slider', 'contrast-slider', 'threshold-slider', 'hatch-spacing', 'hatch-angle',
+                 'stipple-points')
+
+
 @callback(
     Output('source-preview', 'figure'),
     Output('processed-preview', 'figure'),
     Output('path-stats', 'children'),
+    Output('toolpath-preview', 'figure'),
+    Output('toolpath-key', 'data'),
+    Output('job-key', 'data'),
     [Input('process-btn', 'n_clicks'),
      Input('brightness-slider', 'value'),
      Input('contrast-slider', 'value'),
      Input('threshold-slider', 'value'),
      Input('invert-check', 'value'),
      Input('edge-method', 'value'),
-     Input('vector-method', 'value')],
+     Input('vector-method', 'value'),
+     Input('hatch-spacing', 'value'),
+     Input('hatch-angle', 'value'),
+     Input('hatch-link', 'value'),
+     Input('stipple-points', 'value'),
+     Input('simplify-method', 'value'),
+     Input('cleanup-paths', 'value')],
+    [Input(slider, 'drag_value') for slider in _DRAG_SLIDERS],
     State('global-image-data', 'data'),
+    State('session-id', 'data'),
 )
 def process_image(
     n_clicks: int | None,
@@ -54,31 +73,113 @@ def process_image(
     invert: list[int],
     edge_method: str,
     vector_method: str,
-    image_data: str | None,
+    hatch_spacing: int,
+    hatch_angle: int,
+    hatch_link: list[int],
+    stipple_points: int,
+    simplify_method: str,
+    cleanup_paths: list[int],
+    brightness_drag: int | None,
+    contrast_drag: int | None,
+    threshold_drag: int | None,
+    hatch_spacing_drag: int | None,
+    hatch_angle_drag: int | None,
+    stipple_points_drag: int | None,
+    image_key: str | None,
+    session_id: str,
 ):
-    """Process uploaded image."""
-    if not image_data:
-        empty_fig = create_empty_figure()
-        return empty_fig, empty_fig, "Upload an image to get started"
+    """Process uploaded image, recomputing only the pipeline stages whose inputs changed.
 
-    try:
-        content_type, content_string = image_data.split(',')
-        decoded = base64.b64decode(content_string)
-        img = Image.open(io.BytesIO(decoded)).convert('L')
+    While a slider is being dragged the pipeline runs on a low-resolution
+    proxy using the dragged values; releasing it, or any other control,
+    runs at full resolution. Each run supersedes the ones before it in the
+    same browser tab, and a superseded run stops at its next check, between
+    stages or inside vectorization.
+    Only full-resolution paths become the job offered for download.
+    """
+    if not image_key or image_key not in image_store:
+        empty_fig = create_empty_figure()
+        message = "Upload an image to get started" if not image_key else "Image expired, please upload it again"
+        return empty_fig, empty_fig, message, empty_fig, None, None
 
-        processed_img = apply_filters(img, brightness, contrast, threshold, bool(invert), edge_method)
+    triggered = ctx.triggered_prop_ids
+    proxy = bool(triggered) and all(prop.endswith('.drag_value') for prop in triggered)
+    if proxy:
+        brightness, contrast, threshold, hatch_spacing, hatch_angle, stipple_points = (
+            value if drag is None else drag
+            for drag, value in zip(
+                (brightness_drag, contrast_drag, threshold_drag, hatch_spacing_drag, hatch_angle_drag,
+                 stipple_points_drag),
+                (brightness, contrast, threshold, hatch_spacing, hatch_angle, stipple_points),
+            )
+        )
 
-        paths = extract_paths(processed_img, vector_method)
-        stats = f"Paths: {len(paths)} | Est. time: {len(paths) * 2} seconds | Distance: {len(paths) * 10}mm"
+    ticket = pipeline.runs.start(session_id)
+    check = functools.partial(pipeline.runs.check, session_id, ticket)
+    try:
+        source_key, load, pixel_scale = pipeline.source_image(image_key, proxy=proxy)
+        filter_key, processed_img = pipeline.filter_image(
+            source_key, load, brightness, contrast, threshold, bool(invert), edge_method,
+        )
+        check()
+        paths_key, (paths, order_stats, cleanup_stats) = pipeline.vectorize(
+            filter_key, processed_img, vector_method, DEFAULT_PLOT_SETTINGS, pixel_scale, optimize=not proxy,
+            cleanup=bool(cleanup_paths),
+            tone=lambda: pipeline.tone_image(source_key, load, brightness, contrast, bool(invert))[1],
+            edge_method=edge_method, check=check,
+            hatch_spacing=hatch_spacing, hatch_angle=hatch_angle, hatch_link=bool(hatch_link),
+            stipple_points=stipple_points,
+        )
+        paths_key, (paths, simplify_stats) = pipeline.simplify(
+            paths_key, paths, simplify_method, DEFAULT_PLOT_SETTINGS,
+        )
+        check()
+        if proxy:
+            stats = f"Preview: {len(paths)} paths at reduced resolution, release the slider for full detail"
+        else:
+            estimate = estimate_job(paths, DEFAULT_PLOT_SETTINGS)
+            stats = (
+                f"Paths: {len(paths)} | Est. time: {estimate.duration_text}"
+                f" | Drawing: {estimate.draw_distance:.0f}mm | Pen lifts: {estimate.pen_lifts}"
+                f" | Pen-up travel: {order_stats.travel_before:.0f}mm → {order_stats.travel_after:.0f}mm"
+                f" | Fragments joined: {cleanup_stats.paths_before} → {cleanup_stats.paths_after}"
+                f", {cleanup_stats.segments_removed} double strokes removed"
+                f" | Vertices: {simplify_stats.vertices_before} → {simplify_stats.vertices_after}"
+                f" ({simplify_stats.ratio:.1f}x fewer)"
+            )
 
-        source_fig = create_image_figure(img, "Source")
-        processed_fig = create_image_figure(processed_img, "Processed")
+        source_fig = pipeline.image_figure(source_key, "Source", load)
+        processed_fig = pipeline.image_figure(filter_key, "Processed", lambda: processed_img)
+        toolpath_fig = create_toolpath_figure(paths, DEFAULT_PLOT_SETTINGS)
+        pipeline.log_stats()
 
-        return source_fig, processed_fig, stats
+        job_key = no_update if proxy else job_store.put(paths, paths_key)
+        return source_fig, processed_fig, stats, toolpath_fig, paths_key, job_key
+    except pipeline.Superseded:
+        logger.debug("Dropped superseded run for session %s", session_id)
+        raise PreventUpdate
     except Exception as exc:  # pragma: no cover - placeholder
         logger.error("Image processing failed: %s", exc)
         empty_fig = create_empty_figure()
-        return empty_fig, empty_fig, f"Error: {exc}"
+        return empty_fig, empty_fig, f"Error: {exc}", empty_fig, None, None
+
+
+@callback(
+    Output('toolpath-preview', 'figure', allow_duplicate=True),
+    Input('toolpath-preview', 'relayoutData'),
+    State('toolpath-key', 'data'),
+    prevent_initial_call=True,
+)
+def refine_toolpath(relayout: dict | None, paths_key: str | None):
+    """Redraw the toolpath preview at the detail of the zoomed-in window."""
+    view = view_from_relayout(relayout)
+    if view is None and not (relayout or {}).get('xaxis.autorange'):
+        raise PreventUpdate
+    cached = pipeline.stage_cache.peek(paths_key) if paths_key else None
+    if cached is None:
+        raise PreventUpdate
+    paths, _ = cached
+    return create_toolpath_figure(paths, DEFAULT_PLOT_SETTINGS, view)
 
 
 @callback(
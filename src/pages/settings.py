@@ -4,6 +4,7 @@ from dash import dcc, html
 import dash_bootstrap_components as dbc
 
 from src.components.controls import create_plot_settings
+from src.constants import DEFAULT_PLOT_SETTINGS
 
 # Register this page
 
@@ -80,7 +81,8 @@ layout = dbc.Container([
                     html.H6("SVG Settings"),
 
                     dbc.Label("Stroke Width"),
-                    dbc.Input(id='svg-stroke-width', type='number', value=0.5, min=0.1, max=5, step=0.1),
+                    dbc.Input(id='svg-stroke-width', type='number', value=DEFAULT_PLOT_SETTINGS.stroke_width,
+                              min=0.1, max=5, step=0.1),
 
                     dbc.Label("Units", className="mt-2"),
                     dcc.Dropdown(
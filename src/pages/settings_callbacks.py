@@ -1,8 +1,14 @@
 """Callbacks for the settings page."""
 import logging
-from dash import Input, Output, State, callback
+from dataclasses import replace
+
+from dash import Input, Output, State, callback, html
 import dash_bootstrap_components as dbc
 
+from src.constants import DEFAULT_PLOT_SETTINGS
+from src.utils.jobs import job_store
+from src.utils.kinematics import estimate_job
+
 logger = logging.getLogger(__name__)
 
 
@@ -24,3 +30,40 @@ def test_connection(n_clicks: int, port: str, baud_rate: int):
         return dbc.Alert("Connection successful!", color="success")
     return ""
 
+
+@callback(
+    Output('job-stats', 'children'),
+    Input('job-key', 'data'),
+    Input('feed-rate', 'value'),
+    Input('travel-rate', 'value'),
+    Input('acceleration', 'value'),
+    Input('pen-lift', 'value'),
+)
+def update_job_stats(
+    job_key: str | None,
+    feed_rate: int | None,
+    travel_rate: int | None,
+    acceleration: float | None,
+    pen_lift: int | None,
+):
+    """Estimate the current job's distances and plotting time with the machine settings on this page."""
+    paths = job_store.get(job_key) if job_key else None
+    if paths is None:
+        return html.P("No job loaded", className="text-muted")
+
+    defaults = DEFAULT_PLOT_SETTINGS
+    settings = replace(
+        defaults,
+        feed_rate=feed_rate or defaults.feed_rate,
+        travel_rate=travel_rate or defaults.travel_rate,
+        acceleration=acceleration or defaults.acceleration,
+        pen_lift_height=pen_lift if pen_lift is not None else defaults.pen_lift_height,
+    )
+    estimate = estimate_job(paths, settings)
+    return html.Ul([
+        html.Li(f"Paths: {len(paths)}"),
+        html.Li(f"Estimated time: {estimate.duration_text}"),
+        html.Li(f"Drawing distance: {estimate.draw_distance:.0f}mm"),
+        html.Li(f"Pen-up travel: {estimate.travel_distance:.0f}mm"),
+        html.Li(f"Pen lifts: {estimate.pen_lifts}"),
+    ], className="mb-0")
@@ -0,0 +1,70 @@
+"""Plain Flask routes served next to the Dash app."""
+from __future__ import annotations
+
+import logging
+from urllib.parse import urlencode
+
+from flask import Flask, Response, abort, request, stream_with_context
+
+from src.constants import DEFAULT_PLOT_SETTINGS
+from src.utils.jobs import job_store
+from src.utils.plotting import download_filename, generate_gcode
+
+logger = logging.getLogger(__name__)
+
+# Decimal places offered for G-code coordinates.
+GCODE_PRECISION_RANGE = (0, 6)
+# Arc fitting tolerances offered, in mm.
+ARC_TOLERANCE_RANGE = (0.001, 1.0)
+
+
+def clamp(value: float, bounds: tuple[float, float]) -> float:
+    """``value`` limited to an option's ``(low, high)`` range."""
+    low, high = bounds
+    return min(max(value, low), high)
+
+
+def gcode_url(
+    job_key: str,
+    compact: bool = False,
+    precision: int = 3,
+    relative: bool = False,
+    arc_tolerance: float | None = None,
+) -> str:
+    """Link that streams the G-code for a stored job, with arcs fitted if ``arc_tolerance`` is given."""
+    query = {'precision': precision}
+    if compact:
+        query['compact'] = 1
+    if relative:
+        query['relative'] = 1
+    if arc_tolerance is not None:
+        query['arcs'] = arc_tolerance
+    return f"/download/{job_key}.gcode?{urlencode(query)}"
+
+
+def register_routes(server: Flask) -> None:
+    """Add the download routes to the app's Flask server."""
+
+    @server.route('/download/<job_key>.gcode')
+    def download_gcode(job_key: str):
+        """Stream a job's G-code as a file download, formatted chunk by chunk."""
+        arc_tolerance = request.args.get('arcs', None, type=float)
+        if arc_tolerance is None:
+            paths = job_store.get(job_key)
+        else:
+            fitted = job_store.arcs(job_key, clamp(arc_tolerance, ARC_TOLERANCE_RANGE))
+            paths = fitted[0] if fitted else None
+        if paths is None:
+            abort(404, description="Job not found, please regenerate it")
+
+        precision = clamp(request.args.get('precision', 3, type=int), GCODE_PRECISION_RANGE)
+        compact = request.args.get('compact', 0, type=int) == 1
+        relative = request.args.get('relative', 0, type=int) == 1
+
+        logger.info("Streaming G-code for job %s", job_key)
+        chunks = generate_gcode(paths, DEFAULT_PLOT_SETTINGS, compact, precision, relative)
+        return Response(
+            stream_with_context(chunks),
+            mimetype='text/plain',
+            headers={'Content-Disposition': f'attachment; filename="{download_filename("gcode")}"'},
+        )
@@ -0,0 +1,180 @@
+"""Circular arc fitting for G-code export.
+
+Curved toolpaths arrive as many short chords, one ``G1`` each, which can
+starve a small controller's planner. :func:`fit_arcs` replaces runs of
+vertices lying on a circle with single ``G2``/``G3`` moves.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.utils.paths import PathSet, _offsets_from_sizes, _ranges
+
+logger = logging.getLogger(__name__)
+
+# Largest distance, in mm, an arc may stray from the vertices it replaces.
+ARC_TOLERANCE_MM = 0.02
+# Largest bulge, in mm, of an arc past the chords it replaces. Sampled curves bow
+# away from their own chords, so this is looser, but still under a pen width so
+# genuine polygons keep their corners.
+ARC_CHORD_TOLERANCE_MM = 0.1
+# Fewest vertices an arc replaces, so it removes at least two moves.
+ARC_MIN_VERTICES = 4
+# Arcs are kept well short of a full turn, where start and end would coincide.
+ARC_MAX_SWEEP = 1.5 * np.pi
+# Flatter runs are left as straight moves rather than huge, ill-conditioned arcs.
+ARC_MAX_RADIUS_MM = 1000.0
+# Fewest decimals arcs are written with; coarser rounding makes controllers reject
+# arcs whose start and end radius no longer agree.
+ARC_MIN_PRECISION = 3
+# Rounds of splitting before the remaining spans are left as straight moves.
+ARC_MAX_ROUNDS = 48
+
+# Motion codes, per vertex, of an ArcPaths.
+TRAVEL, LINE, ARC_CW, ARC_CCW = 0, 1, 2, 3
+
+
+@dataclass
+class ArcPaths:
+    """Paths whose drawing moves may be circular arcs.
+
+    ``paths`` holds the vertices that are still emitted. ``motion`` says
+    how each vertex is reached from the one before it: :data:`TRAVEL` for
+    the first vertex of a path, :data:`LINE` for a straight move and
+    :data:`ARC_CW` or :data:`ARC_CCW` (the G-code numbers) for an arc
+    around the matching row of ``centers``, which is NaN elsewhere.
+    """
+    paths: PathSet
+    motion: np.ndarray
+    centers: np.ndarray
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the paths, motion codes and centres."""
+        return self.paths.nbytes + self.motion.nbytes + self.centers.nbytes
+
+
+@dataclass
+class ArcStats:
+    """Moves before and after fitting, and the number of arcs that replaced chords."""
+    moves_before: int
+    moves_after: int
+    arcs: int
+
+    @property
+    def moves_removed(self) -> int:
+        """Moves saved by fitting."""
+        return self.moves_before - self.moves_after
+
+
+def _test_spans(coords: np.ndarray, lo: np.ndarray, hi: np.ndarray, tolerance: float, chord_tolerance: float):
+    """Fit a circle through the ends and middle of every span and check it against the span.
+
+    Returns ``(fits, centers, ccw, split)`` where ``split`` is the interior
+    vertex to split a failing span at: its worst vertex, or the middle one
+    when no vertex is to blame (a straight run, or too long a sweep).
+    """
+    mid = (lo + hi) // 2
+    p0, p1, p2 = coords[lo], coords[mid], coords[hi]
+    a, b = p1 - p0, p2 - p0
+    cross = a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]
+    aa, bb = (a * a).sum(axis=1), (b * b).sum(axis=1)
+    shift = np.stack([b[:, 1] * aa - a[:, 1] * bb, a[:, 0] * bb - b[:, 0] * aa], axis=1)
+    centers = p0 + shift / (2 * cross)[:, None]
+    radius = np.hypot(*(p0 - centers).T)
+    ccw = cross > 0
+    valid = np.isfinite(radius) & (radius <= ARC_MAX_RADIUS_MM) & (np.sqrt(bb) >= tolerance)
+
+    sizes = hi - lo + 1
+    offsets = _offsets_from_sizes(sizes)
+    index = _ranges(lo, sizes, offsets)
+    span = np.repeat(np.arange(len(lo)), sizes)
+    rel = coords[index] - centers[span]
+    deviation = np.abs(np.hypot(*rel.T) - radius[span])
+
+    # Signed turn of every chord around the centre, positive in the arc's direction.
+    prev = np.roll(rel, 1, axis=0)
+    turn = np.arctan2(prev[:, 0] * rel[:, 1] - prev[:, 1] * rel[:, 0], (prev * rel).sum(axis=1))
+    turn = np.where(ccw[span], turn, -turn)
+    first = offsets[:-1]
+    turn[first] = 0.0
+    sagitta = radius[span] * (1 - np.cos(turn / 2))
+
+    # Scaled so both limits compare against tolerance.
+    score = np.maximum(deviation, sagitta * (tolerance / chord_tolerance))
+    score[turn <= 0] = np.inf
+    score[first] = 0.0
+    score = np.nan_to_num(score, nan=np.inf)
+    worst = np.maximum.reduceat(score, first)
+    sweep = np.add.reduceat(turn, first)
+    fits = valid & (worst <= tolerance) & (sweep <= ARC_MAX_SWEEP)
+
+    # Split at the worst interior vertex if it is out of tolerance, else at the middle.
+    interior = score.copy()
+    interior[offsets[1:] - 1] = -1.0
+    interior[first] = -1.0
+    order = np.lexsort((-interior, span))
+    split = index[order[first]]
+    blameless = ~valid | (interior[order[first]] <= tolerance)
+    split[blameless] = mid[blameless]
+    return fits, centers, ccw, split
+
+
+def fit_arcs(
+    paths: PathSet,
+    tolerance: float = ARC_TOLERANCE_MM,
+    chord_tolerance: float = ARC_CHORD_TOLERANCE_MM,
+) -> tuple[ArcPaths, ArcStats]:
+    """Replace runs of vertices lying on a circle with arc moves.
+
+    Every path starts as one span; spans whose circle through their first,
+    middle and last vertex strays more than ``tolerance`` from any vertex,
+    or bulges more than ``chord_tolerance`` past any chord, are split at
+    their worst vertex, all spans of a round being tested together. Spans with fewer than :data:`ARC_MIN_VERTICES`
+    vertices stay straight. Arc ends are always original vertices.
+    """
+    coords = paths.coords.astype(np.float64)
+    sizes = paths.sizes
+    long = sizes >= ARC_MIN_VERTICES
+    lo, hi = paths.offsets[:-1][long], paths.offsets[1:][long] - 1
+
+    found_lo, found_hi, found_centers, found_ccw = [], [], [], []
+    for _ in range(ARC_MAX_ROUNDS):
+        if not len(lo):
+            break
+        # Collinear spans have no centre; their NaNs fail the tests below by design.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fits, centers, ccw, split = _test_spans(coords, lo, hi, tolerance, chord_tolerance)
+        found_lo.append(lo[fits])
+        found_hi.append(hi[fits])
+        found_centers.append(centers[fits])
+        found_ccw.append(ccw[fits])
+        lo, hi, split = lo[~fits], hi[~fits], split[~fits]
+        lo, hi = np.concatenate([lo, split]), np.concatenate([split, hi])
+        keep = hi - lo + 1 >= ARC_MIN_VERTICES
+        lo, hi = lo[keep], hi[keep]
+
+    arc_lo = np.concatenate(found_lo) if found_lo else np.empty(0, dtype=np.int64)
+    arc_hi = np.concatenate(found_hi) if found_hi else np.empty(0, dtype=np.int64)
+
+    # Vertices strictly inside an arc are dropped; the arc's end vertex carries its centre.
+    cover = np.zeros(len(coords) + 1, dtype=np.int64)
+    np.add.at(cover, arc_lo + 1, 1)
+    np.add.at(cover, arc_hi, -1)
+    keep = np.cumsum(cover[:-1]) == 0
+
+    motion = np.full(len(coords), LINE, dtype=np.int8)
+    motion[paths.offsets[:-1][sizes > 0]] = TRAVEL
+    centers = np.full((len(coords), 2), np.nan, dtype=np.float64)
+    if len(arc_hi):
+        motion[arc_hi] = np.where(np.concatenate(found_ccw), ARC_CCW, ARC_CW)
+        centers[arc_hi] = np.concatenate(found_centers)
+
+    kept_sizes = np.bincount(paths.path_ids()[keep], minlength=len(paths))
+    result = ArcPaths(PathSet(paths.coords[keep], _offsets_from_sizes(kept_sizes)), motion[keep], centers[keep])
+    stats = ArcStats(paths.num_points, int(keep.sum()), len(arc_hi))
+    logger.debug("Fitted %d arcs, %d -> %d moves", stats.arcs, stats.moves_before, stats.moves_after)
+    return result, stats
@@ -0,0 +1,344 @@
+"""Fragment joining and double-stroke removal for traced toolpaths.
+
+Tracing edge-detected images yields many short fragments whose ends touch
+and strokes that run over each other. :func:`clean_paths` removes segments
+that lie on top of longer ones, then snaps touching ends together and
+joins the fragments into longer polylines, so the pen lifts less often and
+never draws the same line twice. Neighbour lookups go through a uniform
+grid keyed by cell, so work grows with the number of segments.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+
+from src.constants import PlotSettings
+from src.utils.fills import _chain_order
+from src.utils.paths import PathSet, _offsets_from_sizes, _ranges
+from src.utils.simplify import _segment_distance, simplify_paths
+
+logger = logging.getLogger(__name__)
+
+# Default tolerance as a fraction of the stroke width; closer strokes merge under the pen.
+CLEANUP_STROKE_FRACTION = 0.5
+# Stair-steps flatter than this fraction of the tolerance are merged before the
+# overlap test; at the default stroke width it matches the simplification tolerance.
+CLEANUP_MERGE_FRACTION = 0.4
+# Edge filters whose traced contours come out as fragments and double strokes.
+CLEANUP_EDGE_METHODS = ('canny', 'sobel', 'laplacian')
+# Cells per axis reserved by the grid key; plot coordinates stay far inside it.
+_GRID_SPAN = 1 << 31
+# Most candidate pairs a neighbour search holds at once.
+_PAIR_CHUNK = 1 << 18
+# Offsets of a grid cell and its eight neighbours.
+_NEIGHBOURS = np.array([(i, j) for i in (-1, 0, 1) for j in (-1, 0, 1)], dtype=np.int64)
+
+
+@dataclass
+class CleanupStats:
+    """Paths before and after joining, and the double-stroke segments removed."""
+    paths_before: int
+    paths_after: int
+    segments_removed: int
+
+
+def cleanup_tolerance(plot_settings: PlotSettings) -> float:
+    """Default snapping and overlap tolerance, in mm, for a plot's stroke width."""
+    return plot_settings.stroke_width * CLEANUP_STROKE_FRACTION
+
+
+def needs_cleanup(method: str, edge_method: str) -> bool:
+    """Whether paths from a vectorization method and edge filter are worth cleaning up.
+
+    Fills are laid out at their own spacing, which may be finer than the
+    stroke width, so only contours traced from an edge filter qualify.
+    """
+    return method == 'contour' and edge_method in CLEANUP_EDGE_METHODS
+
+
+def _cell_keys(cells: np.ndarray) -> np.ndarray:
+    return (cells[:, 0] + _GRID_SPAN // 2) * _GRID_SPAN + (cells[:, 1] + _GRID_SPAN // 2)
+
+
+def _cell_table(points: np.ndarray, cell: float) -> tuple[np.ndarray, np.ndarray]:
+    """Sorted grid-cell keys of ``points`` and the point index behind each key."""
+    keys = _cell_keys(np.floor(points / cell).astype(np.int64))
+    order = np.argsort(keys, kind='stable')
+    return keys[order], order
+
+
+def _cell_pairs(table: tuple[np.ndarray, np.ndarray], cells: np.ndarray, ids: np.ndarray):
+    """Yield ``(id, t)`` pairs of every ``ids[k]`` and each table point ``t`` in cell ``cells[k]``.
+
+    ``table`` comes from :func:`_cell_table`. Pairs come about
+    :data:`_PAIR_CHUNK` at a time, so dense drawings never hold every
+    candidate at once.
+    """
+    keys, order = table
+    wanted = _cell_keys(cells)
+    lo = np.searchsorted(keys, wanted, side='left')
+    counts = np.searchsorted(keys, wanted, side='right') - lo
+    chunk = np.maximum(np.cumsum(counts) - 1, 0) // _PAIR_CHUNK
+    bounds = np.r_[0, np.flatnonzero(np.diff(chunk)) + 1, len(counts)]
+    for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        c = counts[start:stop]
+        yield np.repeat(ids[start:stop], c), order[_ranges(lo[start:stop], c, _offsets_from_sizes(c))]
+
+
+def _grid_pairs(query: np.ndarray, table: np.ndarray, cell: float) -> tuple[np.ndarray, np.ndarray]:
+    """All ``(q, t)`` index pairs whose points share a grid cell or touch neighbouring ones.
+
+    Every point within ``cell`` of a query point is among its pairs.
+    """
+    cells = (np.floor(query / cell).astype(np.int64)[:, None] + _NEIGHBOURS).reshape(-1, 2)
+    ids = np.repeat(np.arange(len(query)), len(_NEIGHBOURS))
+    found = list(_cell_pairs(_cell_table(table, cell), cells, ids))
+    if not found:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    q, t = zip(*found)
+    return np.concatenate(q), np.concatenate(t)
+
+
+def _segment_cells(a: np.ndarray, b: np.ndarray, cell: float) -> tuple[np.ndarray, np.ndarray]:
+    """Grid cells holding points within ``cell`` of every segment from ``a`` to ``b``, as ``(segment, cells)``.
+
+    Segments are cut into pieces no longer than ``cell`` and each piece's
+    bounding box, grown by ``cell``, is listed cell by cell; that is at
+    most four cells per axis. Each cell is listed once per segment.
+    """
+    pieces = np.maximum(np.ceil(np.hypot(*(b - a).T) / cell), 1).astype(np.int64)
+    segment = np.repeat(np.arange(len(a)), pieces)
+    step = np.arange(len(segment)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    t0 = (step / pieces[segment])[:, None]
+    t1 = ((step + 1) / pieces[segment])[:, None]
+    p0 = a[segment] + t0 * (b - a)[segment]
+    p1 = a[segment] + t1 * (b - a)[segment]
+    lo = np.floor(np.minimum(p0, p1) / cell).astype(np.int64) - 1
+    span = np.floor(np.maximum(p0, p1) / cell).astype(np.int64) + 2 - lo
+
+    count = span[:, 0] * span[:, 1]
+    piece = np.repeat(np.arange(len(lo)), count)
+    k = np.arange(len(piece)) - np.repeat(np.cumsum(count) - count, count)
+    cells = lo[piece] + np.stack([k // span[piece, 1], k % span[piece, 1]], axis=1)
+    segment = segment[piece]
+    if (pieces == 1).all():
+        return segment, cells
+    keys = _cell_keys(cells)
+    order = np.lexsort((keys, segment))
+    first = np.r_[True, (segment[order][1:] != segment[order][:-1]) | (keys[order][1:] != keys[order][:-1])]
+    order = order[first]
+    return segment[order], cells[order]
+
+
+def _redundant_segments(
+    coords: np.ndarray,
+    owner: np.ndarray,
+    starts: np.ndarray,
+    tolerance: float,
+    check: Callable[[], None] | None = None,
+) -> np.ndarray:
+    """Flag segments lying within ``tolerance`` of a longer segment that is kept.
+
+    Segment ``i`` runs from ``coords[starts[i]]`` to the next vertex and
+    ``owner`` gives each vertex's path. Of equal-length duplicates, such as
+    a stroke and its retrace, the first is kept. Segments no longer than
+    ``tolerance`` are not covered by segments within ``2 * tolerance`` of
+    them along their own path, so fine stair-steps are left to simplification.
+    ``check`` is called before each block of segments.
+    """
+    a, b = coords[starts], coords[starts + 1]
+    length = np.hypot(*(b - a).T)
+    along = np.r_[0.0, np.cumsum(np.hypot(*np.diff(coords, axis=0).T))][starts]
+    path = owner[starts]
+    path_length = np.bincount(path, weights=length)
+
+    # Start points sit in one grid cell each, and every segment visits the cells
+    # within tolerance of it, so each candidate pair is met exactly once.
+    table = _cell_table(a, tolerance)
+    block = _PAIR_CHUNK // 16
+    found_q, found_cover = [], []
+    for first in range(0, len(starts), block):
+        if check is not None:
+            check()
+        covers, cells = _segment_cells(a[first:first + block], b[first:first + block], tolerance)
+        for cover, q in _cell_pairs(table, cells, covers + first):
+            longer = (length[cover] > length[q]) | ((length[cover] == length[q]) & (cover < q))
+
+            # A short segment is near any segment close to it along its own path, so
+            # those only cover it from further along, where the path has turned back.
+            # The gap is measured both ways round, as closed paths wrap.
+            total = path_length[path[q]]
+            gap = np.maximum(along[q] - along[cover] - length[cover], along[cover] - along[q] - length[q])
+            gap = np.minimum(gap, total - length[q] - length[cover] - gap)
+            longer &= (path[cover] != path[q]) | (gap > 2 * tolerance) | (length[q] > tolerance)
+            q, cover = q[longer], cover[longer]
+            near = _segment_distance(a[q], a[cover], b[cover]) <= tolerance
+            q, cover = q[near], cover[near]
+            inside = _segment_distance(b[q], a[cover], b[cover]) <= tolerance
+            found_q.append(q[inside])
+            found_cover.append(cover[inside])
+    q, cover = np.concatenate(found_q), np.concatenate(found_cover)
+
+    # Only kept segments may cover others, or errors would add up along chains
+    # of covers. Covers always rank higher, so deciding from the top down ends.
+    state = np.zeros(len(starts), dtype=np.int8)
+    state[np.bincount(q, minlength=len(starts)) == 0] = 1
+    while len(q):
+        kept = np.zeros(len(starts), dtype=bool)
+        kept[q[state[cover] == 1]] = True
+        pending = np.zeros(len(starts), dtype=bool)
+        pending[q[state[cover] == 0]] = True
+        undecided = state == 0
+        state[undecided & kept] = -1
+        state[undecided & ~kept & ~pending] = 1
+        left = state[q] == 0
+        q, cover = q[left], cover[left]
+    return state == -1
+
+
+def _keep_segments(paths: PathSet, keep: np.ndarray) -> PathSet:
+    """Rebuild paths from kept segments, starting a new path wherever one was dropped.
+
+    ``keep[v]`` flags the segment from vertex ``v`` to ``v + 1``; it must be
+    false for the last vertex of every path.
+    """
+    kept = np.flatnonzero(keep)
+    if not len(kept):
+        return PathSet.empty()
+    previous = np.zeros(len(keep), dtype=bool)
+    previous[1:] = keep[:-1]
+    previous[paths.offsets[:-1]] = False
+    opens = ~previous[kept]
+
+    # Each kept segment adds its end vertex, plus its start vertex if it opens a run.
+    counts = 1 + opens
+    ends = np.cumsum(counts) - 1
+    index = np.empty(int(counts.sum()), dtype=np.int64)
+    index[ends] = kept + 1
+    index[ends[opens] - 1] = kept[opens]
+    run = np.cumsum(opens) - 1
+    sizes = np.bincount(run) + 1
+    return PathSet(paths.coords[index], _offsets_from_sizes(sizes))
+
+
+def _match_endpoints(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Pair path ends within ``tolerance`` of each other, closest pairs first.
+
+    ``points[2 * i]`` and ``points[2 * i + 1]`` are the start and end of path
+    ``i``; a path is never paired with itself. Returns each end's partner,
+    or -1. Each round pairs ends that are each other's nearest free end.
+    """
+    q, t = _grid_pairs(points, points, tolerance)
+    distance = np.hypot(*(points[q] - points[t]).T)
+    near = (q // 2 != t // 2) & (distance <= tolerance)
+    q, t, distance = q[near], t[near], distance[near]
+
+    partner = np.full(len(points), -1, dtype=np.int64)
+    while len(q):
+        order = np.lexsort((t, distance, q))
+        first = np.r_[True, q[order][1:] != q[order][:-1]]
+        nearest = np.full(len(points), -1, dtype=np.int64)
+        nearest[q[order][first]] = t[order][first]
+        ends = np.flatnonzero(nearest >= 0)
+        ends = ends[nearest[nearest[ends]] == ends]
+        partner[ends] = nearest[ends]
+        free = (partner[q] < 0) & (partner[t] < 0)
+        q, t, distance = q[free], t[free], distance[free]
+    return partner
+
+
+def _join_fragments(paths: PathSet, partner: np.ndarray) -> PathSet:
+    """Chain paths whose ends are partners into single polylines.
+
+    Node ``2 * i`` means entering path ``i`` at its start and ``2 * i + 1``
+    at its end; the node after ``x`` is the partner of the end it leaves by.
+    Every chain therefore appears twice, once per direction, and the copy
+    with the lower head is kept. Closed chains are cut at their lowest node.
+    """
+    n = len(partner)
+    after = partner[np.arange(n) ^ 1]
+
+    # Pointer doubling: nodes still linked after enough doublings lie on cycles,
+    # and their running minimum is then the lowest node of their cycle.
+    lowest = np.arange(n)
+    jump = after.copy()
+    for _ in range(max(n, 2).bit_length()):
+        linked = np.flatnonzero(jump >= 0)
+        lowest[linked] = np.minimum(lowest[linked], lowest[jump[linked]])
+        jump[linked] = jump[jump[linked]]
+    cut = np.flatnonzero((jump >= 0) & (lowest == np.arange(n)))
+
+    prev = np.full(n, -1, dtype=np.int64)
+    linked = np.flatnonzero(after >= 0)
+    prev[after[linked]] = linked
+    prev[cut] = -1
+    head, depth = _chain_order(prev)
+
+    nodes = np.flatnonzero(head < head[np.arange(n) ^ 1])
+    nodes = nodes[np.lexsort((depth[nodes], head[nodes]))]
+    chained = paths.take(nodes // 2, reverse=nodes % 2 == 1)
+
+    # Joined ends sit on top of each other, so later fragments drop their first vertex.
+    opens = np.r_[True, head[nodes][1:] != head[nodes][:-1]]
+    keep = np.ones(chained.num_points, dtype=bool)
+    keep[chained.offsets[:-1][~opens]] = False
+    chain = np.cumsum(opens) - 1
+    sizes = np.bincount(chain, weights=chained.sizes - ~opens).astype(np.int64)
+    return PathSet(chained.coords[keep], _offsets_from_sizes(sizes))
+
+
+def clean_paths(
+    paths: PathSet, tolerance: float, check: Callable[[], None] | None = None,
+) -> tuple[PathSet, CleanupStats]:
+    """Remove double strokes, then snap touching path ends together and join them.
+
+    Pixel stair-steps are merged first, simplifying the paths by
+    :data:`CLEANUP_MERGE_FRACTION` of ``tolerance``: every step multiplies
+    the segments to compare while the pen could not draw it anyway. A
+    segment is then dropped when both its ends lie within ``tolerance`` mm
+    of a longer segment that stays, splitting its path there. Path ends within
+    ``tolerance`` of each other are then moved to their midpoint and the
+    paths joined, reversing them where needed. ``check`` is called between
+    blocks of the double-stroke search, so a caller can abort it by raising.
+    """
+    if not paths.num_points or tolerance <= 0:
+        return paths, CleanupStats(len(paths), len(paths), 0)
+
+    paths_before = len(paths)
+    paths = paths.take(np.flatnonzero(paths.sizes > 0))
+    paths, _ = simplify_paths(paths, tolerance * CLEANUP_MERGE_FRACTION)
+    coords = paths.coords.astype(np.float64)
+    owner = paths.path_ids()
+    starts = np.flatnonzero(owner[:-1] == owner[1:])
+    removed = 0
+    if len(starts):
+        redundant = _redundant_segments(coords, owner, starts, tolerance, check)
+        removed = int(redundant.sum())
+        if removed:
+            keep = np.zeros(paths.num_points, dtype=bool)
+            keep[starts[~redundant]] = True
+            # Paths of a single vertex have no segments and are kept as dots.
+            dots = paths.take(np.flatnonzero(paths.sizes == 1))
+            paths = PathSet.concatenate([_keep_segments(paths, keep), dots])
+
+    ends = np.empty(2 * len(paths), dtype=np.int64)
+    ends[0::2] = paths.offsets[:-1]
+    ends[1::2] = paths.offsets[1:] - 1
+    points = paths.coords[ends].astype(np.float64)
+    partner = _match_endpoints(points, tolerance)
+
+    joined = np.flatnonzero(partner >= 0)
+    if len(joined):
+        snapped = paths.coords.copy()
+        snapped[ends[joined]] = (points[joined] + points[partner[joined]]) / 2
+        paths = _join_fragments(PathSet(snapped, paths.offsets), partner)
+
+    stats = CleanupStats(paths_before, len(paths), removed)
+    logger.debug(
+        "Cleaned up paths: %d -> %d paths, %d double-stroke segments removed",
+        stats.paths_before, stats.paths_after, stats.segments_removed,
+    )
+    return paths, stats
@@ -0,0 +1,305 @@
+"""Region fill engines for the CNC Pen Plotter application.
+
+Every engine takes a uint8 ink mask (1 where the pen should draw) and returns
+a :class:`~src.utils.paths.PathSet` in pixel coordinates.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+
+import cv2
+import numpy as np
+
+from src.utils.lru import ByteLRU
+from src.utils.paths import PathSet
+
+logger = logging.getLogger(__name__)
+
+
+def _hatch_frame(shape: tuple[int, int], spacing: float, angle: float):
+    """Describe the rotated scanline frame used for hatching.
+
+    Returns ``(origin, along, across, half)`` where scanline ``i`` column ``j``
+    maps to image point ``origin + j * along + i * spacing * across``.
+    """
+    h, w = shape
+    theta = np.deg2rad(angle)
+    # Image rows grow downwards, so negate the sine to keep angles counter-clockwise on screen.
+    along = np.array([np.cos(theta), -np.sin(theta)])
+    across = np.array([np.sin(theta), np.cos(theta)])
+    centre = np.array([(w - 1) / 2, (h - 1) / 2])
+    half = int(np.ceil(np.hypot(w, h) / 2))
+    origin = centre - half * along - half * across
+    return origin, along, across, half
+
+
+def sample_scanlines(mask: np.ndarray, spacing: float, angle: float) -> tuple[np.ndarray, tuple]:
+    """Resample ``mask`` onto hatch scanlines ``spacing`` pixels apart.
+
+    Only the scanlines themselves are sampled, so the rotated image is never
+    materialised at full resolution.
+    """
+    origin, along, across, half = _hatch_frame(mask.shape, spacing, angle)
+    cols = 2 * half + 1
+    rows = int(2 * half // spacing) + 1
+    inverse = np.array([
+        [along[0], across[0] * spacing, origin[0]],
+        [along[1], across[1] * spacing, origin[1]],
+    ])
+    scan = cv2.warpAffine(
+        mask, inverse, (cols, rows),
+        flags=cv2.INTER_NEAREST | cv2.WARP_INVERSE_MAP,
+        borderMode=cv2.BORDER_CONSTANT, borderValue=0,
+    )
+    return scan, (origin, along, across * spacing)
+
+
+def scanline_runs(scan: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Find every run of ink on every scanline at once.
+
+    Returns ``(rows, first, last)`` arrays in row-major order, where each run
+    covers columns ``first..last`` inclusive of scanline ``rows``.
+    """
+    edges = np.diff(scan.view(np.int8), axis=1, prepend=0, append=0)
+    rows, first = np.nonzero(edges == 1)
+    _, stop = np.nonzero(edges == -1)
+    return rows, first, stop - 1
+
+
+def _chain_order(prev: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Rank the nodes of a forest of linked lists by pointer jumping.
+
+    ``prev[i]`` is the predecessor of node ``i`` or -1 for a chain head.
+    Returns ``(head, depth)``: the head of each node's chain and its distance
+    from that head. Runs in O(n log L) for chains of length at most L.
+    """
+    linked = prev >= 0
+    head = np.where(linked, prev, np.arange(len(prev)))
+    depth = linked.astype(np.int64)
+    jump = prev.copy()
+    active = np.flatnonzero(linked)
+    while len(active):
+        up = jump[active]
+        depth[active] += depth[up]
+        head[active] = head[up]
+        jump[active] = jump[up]
+        active = active[jump[active] >= 0]
+    return head, depth
+
+
+def _links_inside(
+    mask: np.ndarray,
+    start_uv: np.ndarray,
+    stop_uv: np.ndarray,
+    frame: tuple,
+) -> np.ndarray:
+    """Check which scan-frame connecting moves stay on ink pixels the whole way.
+
+    Moves may stray a pixel outside the ink: a link between neighbouring
+    runs follows the region's outline, which is jagged on the raster.
+    """
+    mask = cv2.dilate(mask, np.ones((3, 3), dtype=np.uint8))
+    origin, along, step = frame
+    start = origin + start_uv[:, :1] * along + start_uv[:, 1:] * step
+    stop = origin + stop_uv[:, :1] * along + stop_uv[:, 1:] * step
+    counts = np.ceil(np.hypot(*(stop - start).T)).astype(np.int64) + 2
+
+    link = np.repeat(np.arange(len(counts)), counts)
+    first = np.cumsum(counts) - counts
+    t = (np.arange(counts.sum()) - first[link]) / (counts[link] - 1)
+    points = np.rint(start[link] + t[:, None] * (stop - start)[link]).astype(np.int64)
+
+    h, w = mask.shape
+    x, y = points[:, 0], points[:, 1]
+    ok = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+    ok[ok] = mask[y[ok], x[ok]] > 0
+    return np.bincount(link[~ok], minlength=len(counts)) == 0
+
+
+def link_hatch_runs(
+    mask: np.ndarray,
+    rows: np.ndarray,
+    first: np.ndarray,
+    last: np.ndarray,
+    frame: tuple,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Join runs on adjacent scanlines into boustrophedon chains.
+
+    A run is linked to the first overlapping run on the next scanline when
+    the short connecting move stays within a pixel of the mask, and direction alternates
+    along each chain so the pen zig-zags without lifting.
+
+    Returns ``(order, forward, chain_sizes)``: the run indices in drawing
+    order, whether each run is drawn in increasing column order, and the
+    number of runs in each chain.
+    """
+    n = len(rows)
+    width = int(max(first.max(), last.max())) + 2
+    key = rows * width + last
+    below = np.searchsorted(key, (rows + 1) * width + first)
+    below_safe = np.minimum(below, n - 1)
+    candidate = (below < n) & (rows[below_safe] == rows + 1) & (first[below_safe] <= last)
+
+    # Keep only the first claimant of every run on the next scanline.
+    src = np.flatnonzero(candidate)
+    dst, keep = np.unique(below_safe[src], return_index=True)
+    src = src[keep]
+    prev = np.full(n, -1, dtype=np.int64)
+    prev[dst] = src
+
+    _, depth = _chain_order(prev)
+    forward = depth % 2 == 0
+
+    # The connecting move leaves the exit end of a run and enters the next at the same side,
+    # both extended by half a pixel as the strokes are drawn.
+    exit_col = np.where(forward[src], last[src] + 0.5, first[src] - 0.5)
+    enter_col = np.where(forward[src], last[dst] + 0.5, first[dst] - 0.5)
+    inside = _links_inside(
+        mask,
+        np.stack([exit_col, rows[src]], axis=1).astype(float),
+        np.stack([enter_col, rows[dst]], axis=1).astype(float),
+        frame,
+    )
+    prev[dst[~inside]] = -1
+
+    head, depth = _chain_order(prev)
+    order = np.lexsort((depth, head))
+    chain_sizes = np.bincount(np.unique(head, return_inverse=True)[1])
+    # Chains are contiguous in ``order`` and sorted by head index, matching ``np.unique``.
+    return order, forward, chain_sizes
+
+
+def hatch_fill(mask: np.ndarray, spacing: float, angle: float, link: bool = False) -> PathSet:
+    """Fill the ink mask with parallel lines ``spacing`` pixels apart at ``angle`` degrees.
+
+    With ``link`` set, neighbouring lines are joined end to end in zig-zag
+    order wherever the connecting move stays within a pixel of the filled
+    region, so a whole patch is drawn with a single pen-down.
+    """
+    spacing = max(float(spacing), 1.0)
+    scan, frame = sample_scanlines(mask, spacing, angle)
+    rows, first, last = scanline_runs(scan)
+    if not len(rows):
+        return PathSet.empty()
+
+    if link:
+        # A scanline grazing a jagged outline splits into stubs a sample apart; with
+        # the same pixel of slack the links get, those are drawn as one run.
+        opens = np.r_[True, (rows[1:] != rows[:-1]) | (first[1:] - last[:-1] > 2)]
+        rows, first, last = rows[opens], first[opens], last[np.r_[np.flatnonzero(opens)[1:] - 1, len(last) - 1]]
+
+    # Extend each run by half a pixel so the strokes cover the boundary pixels.
+    u = np.stack([first - 0.5, last + 0.5], axis=1)
+    if link:
+        order, forward, chain_sizes = link_hatch_runs(mask, rows, first, last, frame)
+        u = np.where(forward[:, None], u, u[:, ::-1])[order]
+        rows = rows[order]
+        sizes = 2 * chain_sizes
+    else:
+        sizes = np.full(len(rows), 2)
+
+    origin, along, step = frame
+    coords = origin + u.reshape(-1, 1) * along + np.repeat(rows, 2).reshape(-1, 1) * step
+
+    logger.debug("Hatched %d segments into %d strokes at spacing=%s angle=%s", len(rows), len(sizes), spacing, angle)
+    return PathSet.from_sizes(coords, sizes)
+
+
+class DistanceField:
+    """Euclidean distance from every ink pixel to the edge of its region.
+
+    The transform is computed once; concentric rings and spirals at any
+    spacing are then read off it as iso-contours.
+    """
+
+    def __init__(self, mask: np.ndarray):
+        self.distance = cv2.distanceTransform(mask, cv2.DIST_L2, cv2.DIST_MASK_5)
+
+    def rings(self, spacing: float) -> tuple[list[np.ndarray], np.ndarray]:
+        """Trace the iso-distance rings at ``spacing / 2``, ``3 * spacing / 2``, ...
+
+        The field is quantised into bands ``spacing`` wide and every other
+        band is traced, so a single ``cv2.findContours`` call yields both the
+        outer and inner edge of each traced band, i.e. every ring. Returns
+        the rings and their ``(next, prev, first_child, parent)`` hierarchy.
+        """
+        bands = np.floor(self.distance / spacing + 0.5).astype(np.int32)
+        odd = (bands & 1).astype(np.uint8)
+        rings, hierarchy = cv2.findContours(odd, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+        if hierarchy is None:
+            return [], np.empty((0, 4), dtype=np.int32)
+        return [r.reshape(-1, 2) for r in rings], hierarchy.reshape(-1, 4)
+
+    def concentric(self, spacing: float) -> PathSet:
+        """Fill with closed rings ``spacing`` pixels apart."""
+        rings, _ = self.rings(max(float(spacing), 1.0))
+        return PathSet.from_rings(rings)
+
+    def spiral(self, spacing: float) -> PathSet:
+        """Fill with spirals by joining each ring to the next one inside it.
+
+        Every ring continues into its first nested ring, so a region without
+        branches becomes one continuous stroke; where the field splits into
+        several inner regions the extra branches start strokes of their own.
+        """
+        spacing = max(float(spacing), 1.0)
+        rings, hierarchy = self.rings(spacing)
+        if not rings:
+            return PathSet.empty()
+
+        first_child, parent = hierarchy[:, 2], hierarchy[:, 3]
+        is_first_child = np.zeros(len(rings), dtype=bool)
+        is_first_child[first_child[first_child >= 0]] = True
+
+        strokes = []
+        for head in np.flatnonzero(~is_first_child).tolist():
+            chain = [head]
+            while first_child[chain[-1]] >= 0:
+                chain.append(int(first_child[chain[-1]]))
+            strokes.append(_join_rings([rings[i] for i in chain], spacing))
+        logger.debug("Built %d spiral strokes from %d rings", len(strokes), len(rings))
+        return PathSet.from_polylines(strokes)
+
+
+def _join_rings(rings: list[np.ndarray], spacing: float) -> np.ndarray:
+    """Join nested rings into one stroke that steps inward once per turn."""
+    pieces = []
+    cursor = None
+    for index, ring in enumerate(rings):
+        ring = ring.astype(np.float32)
+        x, y = ring[:, 0], ring[:, 1]
+        # Keep every ring turning the same way so the stroke never doubles back.
+        if np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)) < 0:
+            ring = ring[::-1]
+        if cursor is not None:
+            ring = np.roll(ring, -int(np.argmin(((ring - cursor) ** 2).sum(axis=1))), axis=0)
+
+        loop = np.concatenate([ring, ring[:1]])
+        if index < len(rings) - 1:
+            # Stop one spacing short of closing the loop and cut across to the next ring.
+            travelled = np.r_[0.0, np.cumsum(np.hypot(*np.diff(loop, axis=0).T))]
+            stop = max(travelled[-1] - spacing, 0.0)
+            keep = max(int(np.searchsorted(travelled, stop, side='right')), 1)
+            cut = np.stack([np.interp(stop, travelled, loop[:, 0]), np.interp(stop, travelled, loop[:, 1])])
+            loop = np.concatenate([loop[:keep], cut[None].astype(np.float32)])
+        pieces.append(loop)
+        cursor = loop[-1]
+    return np.concatenate(pieces)
+
+
+# Memory budget for distance fields kept for reuse across spacings.
+DISTANCE_FIELD_CACHE_BYTES = 64 * 1024 * 1024
+
+_distance_fields: ByteLRU[bytes, DistanceField] = ByteLRU(
+    DISTANCE_FIELD_CACHE_BYTES, lambda field: field.distance.nbytes,
+)
+
+
+def distance_field(mask: np.ndarray) -> DistanceField:
+    """Return the distance field for ``mask``, reusing it for identical masks."""
+    key = hashlib.blake2b(mask.tobytes(), digest_size=16, person=repr(mask.shape).encode()[:16]).digest()
+    field = _distance_fields.get(key)
+    if field is None:
+        field = _distance_fields.put(key, DistanceField(mask))
+    return field
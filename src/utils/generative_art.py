@@ -1,61 +1,738 @@
-"""Generative art utilities for the CNC Pen Plotter application."""
+"""Generative art utilities for the CNC Pen Plotter application.
+
+Algorithms draw on a square canvas ``200 * scale`` units wide and emit
+polylines directly; :func:`generate_paths` then fits the canvas to the plot
+area so the result is in plot millimetres.
+"""
 from __future__ import annotations
 
+import functools
 import logging
 
 import cv2
 import numpy as np
-from PIL import Image
+
+from src.constants import DEFAULT_PLOT_SETTINGS, PlotSettings
+from src.utils.fills import scanline_runs
+from src.utils.paths import PathSet, _offsets_from_sizes, _ranges
+from src.utils.simplify import _segment_distance
 
 logger = logging.getLogger(__name__)
 
 
-def generate_art(algorithm: str, complexity: int, scale: float) -> Image.Image:
-    """Generate procedural art based on selected algorithm."""
-    size = int(200 * scale)
+def circle_polylines(centres: np.ndarray, radii: np.ndarray, tolerance: float = 0.1) -> PathSet:
+    """Approximate circles as closed polygons.
+
+    Each circle gets just enough sides that no chord strays more than
+    ``tolerance`` from the true arc, so small circles stay cheap.
+    """
+    centres = np.asarray(centres, dtype=np.float64).reshape(-1, 2)
+    radii = np.asarray(radii, dtype=np.float64).ravel()
+    # A chord spanning angle 2 * a deviates from its arc by r * (1 - cos(a)).
+    half_angle = np.arccos(np.clip(1 - tolerance / np.maximum(radii, 1e-9), -1.0, 1.0))
+    segments = np.clip(np.ceil(np.pi / np.maximum(half_angle, 1e-9)), 8, 256).astype(np.int64)
+
+    sizes = segments + 1
+    owner = np.repeat(np.arange(len(radii)), sizes)
+    step = np.arange(int(sizes.sum())) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    theta = 2 * np.pi * step / segments[owner]
+    coords = centres[owner] + radii[owner, None] * np.stack([np.cos(theta), np.sin(theta)], axis=1)
+    return PathSet.from_sizes(coords, sizes)
+
+
+def _canvas_fit(lo, hi, size: float, margin: float = 10.0, flip_y: bool = False):
+    """Return the ``(scale, offset)`` that centres the box ``lo..hi`` on the canvas inside ``margin``."""
+    extent = max(hi[0] - lo[0], hi[1] - lo[1], 1e-9)
+    k = (size - 2 * margin) / extent
+    sy = -k if flip_y else k
+    offset = (size / 2 - k * (lo[0] + hi[0]) / 2, size / 2 - sy * (lo[1] + hi[1]) / 2)
+    return (k, sy), offset
+
+
+def _fit_to_canvas(paths: PathSet, size: float, margin: float = 10.0, flip_y: bool = False) -> PathSet:
+    """Scale and centre paths to fill the canvas inside ``margin``."""
+    if not paths.num_points:
+        return paths
+    x0, y0, x1, y1 = paths.bounds()
+    return paths.transform(*_canvas_fit((x0, y0), (x1, y1), size, margin, flip_y))
+
+
+def value_noise(shape: tuple[int, int], cells: int, rng: np.random.Generator, octaves: int = 3) -> np.ndarray:
+    """Smooth fractal noise in ``[0, 1]`` built from upsampled random lattices."""
+    h, w = shape
+    noise = np.zeros(shape, dtype=np.float32)
+    amplitude, total = 1.0, 0.0
+    for octave in range(octaves):
+        lattice = rng.random((cells * 2 ** octave + 1,) * 2, dtype=np.float32)
+        noise += amplitude * cv2.resize(lattice, (w, h), interpolation=cv2.INTER_CUBIC)
+        total += amplitude
+        amplitude /= 2
+    noise /= total
+    return (noise - noise.min()) / max(float(noise.max() - noise.min()), 1e-6)
+
+
+def _flow_field(
+    size: int,
+    complexity: int,
+    scale: float,
+    rng: np.random.Generator,
+    separation: float | None = None,
+    steps: int | None = None,
+    waves: int = 4,
+) -> PathSet:
+    """Trace streamlines through a noise angle field, all particles at once.
+
+    Every live particle advances one unit per step along the field, and
+    seeds are released in ``waves`` staggered batches so later lines fill
+    the gaps left by earlier ones. A collision grid with ``separation``-sized
+    cells records which line claimed each cell; a particle stops as soon as
+    another line holds a cell in its 3x3 neighbourhood, which keeps
+    streamlines at least ``separation`` apart.
+    """
+    separation = separation or 6.0 / complexity
+    steps = steps or int(60 * scale)
+    count = int(complexity * 1000 * scale ** 2)
+
+    resolution = 2
+    field = value_noise((size * resolution, size * resolution), cells=3 + complexity // 3, rng=rng)
+    angles = (field * 4 * np.pi).astype(np.float32)
+    cos, sin = np.cos(angles), np.sin(angles)
+
+    cells = int(np.ceil(size / separation)) + 2
+    owner = np.full((cells, cells), -1, dtype=np.int64)
+    neighbours = [(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1)]
+
+    pos = rng.random((count, 2), dtype=np.float32) * np.float32(size)
+    born = (np.arange(count) % waves) * max(steps // 2, 1)
+    trail = np.empty((steps + 1, count, 2), dtype=np.float32)
+    length = np.zeros(count, dtype=np.int64)
+    alive = np.empty(0, dtype=np.int64)
+
+    for step in range(int(born.max()) + steps + 1):
+        alive = np.concatenate([alive, np.flatnonzero(born == step)])
+        p = pos[alive]
+        inside = ((p >= 0) & (p < size)).all(axis=1) & (length[alive] <= steps)
+        alive, p = alive[inside], p[inside]
+
+        # Stop particles that come within a cell of a different line.
+        cx = (p[:, 0] / separation).astype(np.int64) + 1
+        cy = (p[:, 1] / separation).astype(np.int64) + 1
+        blocked = np.zeros(len(alive), dtype=bool)
+        for dy, dx in neighbours:
+            other = owner[cy + dy, cx + dx]
+            blocked |= (other >= 0) & (other != alive)
+        alive, p, cx, cy = alive[~blocked], p[~blocked], cx[~blocked], cy[~blocked]
+
+        # Claim free cells; when several particles land in one free cell only one keeps going.
+        free = owner[cy, cx] < 0
+        owner[cy[free], cx[free]] = alive[free]
+        won = owner[cy, cx] == alive
+        alive, p = alive[won], p[won]
+
+        trail[length[alive], alive] = p
+        length[alive] += 1
+
+        fx = np.minimum((p[:, 0] * resolution).astype(np.int64), size * resolution - 1)
+        fy = np.minimum((p[:, 1] * resolution).astype(np.int64), size * resolution - 1)
+        pos[alive, 0] = p[:, 0] + cos[fy, fx]
+        pos[alive, 1] = p[:, 1] + sin[fy, fx]
+
+    # Every trajectory is a prefix of its column in ``trail``.
+    keep = length >= 2
+    prefix = np.arange(steps + 1)[:, None] < length[None, keep]
+    coords = trail[:, keep].transpose(1, 0, 2)[prefix.T]
+    return PathSet.from_sizes(coords, length[keep])
+
+
+def sample_curve(curve, t_end: float, samples: int, tolerance: float, max_rounds: int = 20) -> np.ndarray:
+    """Sample ``curve`` over ``[0, t_end]`` as one polyline within ``tolerance``.
+
+    ``curve`` maps an array of parameters to an ``(n, 2)`` array of points.
+    Sampling starts from ``samples`` even steps; each round evaluates the
+    midpoint and quarter points of every unsettled interval and splits at
+    the midpoint those where any strays more than ``tolerance`` from the
+    chord segment. The deviation grows with curvature, so tight loops are
+    refined while flat stretches keep their coarse steps.
+    """
+    t = np.linspace(0.0, t_end, samples + 1)
+    points = curve(t)
+    active = np.ones(samples, dtype=bool)
+    for _ in range(max_rounds):
+        index = np.flatnonzero(active)
+        if not len(index):
+            break
+        lo, hi = t[index], t[index + 1]
+        mid_t = (lo + hi) / 2
+        mid = curve(mid_t)
+        # The quarter points catch S-bends whose midpoint happens to sit on the chord.
+        quarters = curve(np.concatenate([(3 * lo + hi) / 4, (lo + 3 * hi) / 4])).reshape(2, -1, 2)
+        a, b = points[index], points[index + 1]
+        # Distance to the chord as a segment, so a probe overshooting its ends counts.
+        error = np.maximum.reduce([_segment_distance(probe, a, b) for probe in (mid, *quarters)])
+        split = error > tolerance
+        if not split.any():
+            break
+
+        at = index[split] + 1
+        t = np.insert(t, at, mid_t[split])
+        points = np.insert(points, at, mid[split], axis=0)
+        # Both halves of a split interval are tested again; everything else is settled.
+        active = np.zeros(len(t) - 1, dtype=bool)
+        halves = at + np.arange(len(at))
+        active[halves - 1] = True
+        active[halves] = True
+    return points
+
+
+def _curve_art(curve, t_end: float, samples: int, size: int, tolerance: float) -> PathSet:
+    """Fit ``curve`` to the canvas from a coarse pass, then sample it adaptively."""
+    coarse = curve(np.linspace(0.0, t_end, samples + 1))
+    k, offset = _canvas_fit(coarse.min(axis=0), coarse.max(axis=0), size)
+    k, offset = np.asarray(k), np.asarray(offset)
+    points = sample_curve(lambda t: curve(t) * k + offset, t_end, samples, tolerance)
+    return PathSet.from_sizes(points, [len(points)])
+
+
+def _spirograph(complexity: int, scale: float, rng: np.random.Generator):
+    """Hypotrochoid traced for ``complexity`` turns of the rolling circle."""
+    R, r, d = 50 * scale, 30 * scale, 40 * scale
 
-    if algorithm == 'flow_field':
-        img = np.zeros((size, size))
-        for _ in range(complexity * 10):
-            x = np.random.randint(0, size)
-            y = np.random.randint(0, size)
-            length = np.random.randint(10, 50)
-            angle = np.random.random() * 2 * np.pi
-            for j in range(length):
-                x_new = int(x + j * np.cos(angle))
-                y_new = int(y + j * np.sin(angle))
-                if 0 <= x_new < size and 0 <= y_new < size:
-                    img[y_new, x_new] = 255
-                angle += np.random.randn() * 0.3
-
-    elif algorithm == 'spirograph':
-        img = np.zeros((size, size))
-        t = np.linspace(0, complexity * 2 * np.pi, 1000 * complexity)
-        R, r, d = 50 * scale, 30 * scale, 40 * scale
+    def curve(t):
         x = (R - r) * np.cos(t) + d * np.cos((R - r) * t / r)
         y = (R - r) * np.sin(t) - d * np.sin((R - r) * t / r)
-        x = ((x - x.min()) / (x.max() - x.min()) * (size - 20) + 10).astype(int)
-        y = ((y - y.min()) / (y.max() - y.min()) * (size - 20) + 10).astype(int)
-        for i in range(len(x) - 1):
-            cv2.line(img, (x[i], y[i]), (x[i + 1], y[i + 1]), 255, 1)
-
-    elif algorithm == 'voronoi':
-        img = np.zeros((size, size))
-        points = np.random.rand(complexity * 5, 2) * size
-        for y in range(size):
-            for x in range(size):
-                distances = np.sqrt((points[:, 0] - x) ** 2 + (points[:, 1] - y) ** 2)
-                if np.min(distances) < 3:
-                    img[y, x] = 255
-
-    elif algorithm == 'circle_packing':
-        img = np.zeros((size, size))
-        for _ in range(complexity * 20):
-            x, y = np.random.randint(10, size - 10), np.random.randint(10, size - 10)
-            r = np.random.randint(5, 20)
-            cv2.circle(img, (x, y), r, 255, 1)
+        return np.stack([x, y], axis=1)
+
+    return curve, complexity * 2 * np.pi, 32 * complexity
+
+
+def _sine_waves(complexity: int, scale: float, rng: np.random.Generator):
+    """Harmonograph: two pairs of slightly detuned, decaying sine waves interfering."""
+    freq = np.array([2.0, 3.0, 3.0, 2.0]) + rng.uniform(-0.02, 0.02, 4)
+    phase = rng.uniform(0, 2 * np.pi, 4)
+    turns = 10 * complexity
+    decay = 3.0 / (turns * 2 * np.pi)
+
+    def curve(t):
+        wave = np.sin(freq * t[:, None] + phase) * np.exp(-decay * t)[:, None]
+        return np.stack([wave[:, 0] + wave[:, 1], wave[:, 2] + wave[:, 3]], axis=1)
+
+    return curve, turns * 2 * np.pi, 32 * turns
+
+
+def _parametric(complexity: int, scale: float, rng: np.random.Generator):
+    """Farris wheel: a sum of circular motions whose frequencies share a residue, giving rotational symmetry."""
+    symmetry = int(rng.integers(3, 8))
+    terms = 2 + complexity // 4
+    freq = 1 + symmetry * rng.integers(-4, 5, terms)
+    freq[0] = 1
+    amplitude = 1.0 / (1 + np.arange(terms)) * rng.uniform(0.5, 1.0, terms)
+    phase = rng.uniform(0, 2 * np.pi, terms)
+
+    def curve(t):
+        angle = freq * t[:, None] + phase
+        return np.stack([(amplitude * np.cos(angle)).sum(axis=1), (amplitude * np.sin(angle)).sum(axis=1)], axis=1)
+
+    return curve, 2 * np.pi, 64 * int(np.abs(freq).max())
+
+
+def clip_segments(
+    start: np.ndarray,
+    stop: np.ndarray,
+    lo: float,
+    hi: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Clip segments to the square ``[lo, hi]`` with vectorized Liang-Barsky.
+
+    Returns the clipped endpoints and a mask of segments that survive.
+    """
+    delta = stop - start
+    # One (p, q) pair per box edge; the segment is inside where p * t <= q.
+    p = np.stack([-delta[:, 0], delta[:, 0], -delta[:, 1], delta[:, 1]], axis=1)
+    q = np.stack([start[:, 0] - lo, hi - start[:, 0], start[:, 1] - lo, hi - start[:, 1]], axis=1)
+    parallel = p == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(parallel, 0.0, q / p)
+    t_enter = np.max(np.where(~parallel & (p < 0), t, 0.0), axis=1)
+    t_exit = np.min(np.where(~parallel & (p > 0), t, 1.0), axis=1)
+    keep = (t_enter <= t_exit) & ~(parallel & (q < 0)).any(axis=1)
+    return start + t_enter[:, None] * delta, start + t_exit[:, None] * delta, keep
+
+
+def _voronoi_facets(points: np.ndarray, size: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the Voronoi cells of ``points`` as a flat vertex array plus sizes.
+
+    Coincident points share one cell, so the distinct sites are returned too.
+
+    ``cv2.Subdiv2D`` builds the Delaunay triangulation incrementally with
+    point location, so this is O(n log n) in the number of cells.
+    """
+    margin = size
+    subdiv = cv2.Subdiv2D((-margin, -margin, size + 3 * margin, size + 3 * margin))
+    subdiv.insert(points.astype(np.float32))
+    facets, sites = subdiv.getVoronoiFacetList([])
+    sizes = np.fromiter(map(len, facets), dtype=np.int64, count=len(facets))
+    return np.concatenate(facets).astype(np.float64), sizes, sites.astype(np.float64)
+
+
+def _ring_successors(sizes: np.ndarray) -> np.ndarray:
+    """Index of the next vertex around each ring in a flat ring buffer."""
+    ends = np.cumsum(sizes)
+    following = np.arange(int(ends[-1])) + 1
+    following[ends - 1] = ends - sizes
+    return following
+
+
+def _voronoi(size: int, complexity: int, scale: float, rng: np.random.Generator, relax: int = 2) -> PathSet:
+    """Voronoi diagram edges, optionally Lloyd-relaxed, clipped to the canvas."""
+    points = rng.random((int(complexity * 40 * scale ** 2), 2)) * size
+
+    for _ in range(relax):
+        vertices, sizes, points = _voronoi_facets(points, size)
+        # Approximate each border cell's clipped polygon by clamping its vertices.
+        vertices = np.clip(vertices, 0, size)
+        starts = np.cumsum(sizes) - sizes
+        following = _ring_successors(sizes)
+        x, y = vertices[:, 0], vertices[:, 1]
+        nx, ny = x[following], y[following]
+        cross = x * ny - nx * y
+        area = np.add.reduceat(cross, starts)
+        cx = np.add.reduceat((x + nx) * cross, starts)
+        cy = np.add.reduceat((y + ny) * cross, starts)
+        valid = np.abs(area) > 1e-6
+        points[valid] = np.stack([cx[valid], cy[valid]], axis=1) / (3 * area[valid, None])
+        np.clip(points, 0, size, out=points)
+
+    vertices, sizes, _ = _voronoi_facets(points, size)
+    a, b = vertices, vertices[_ring_successors(sizes)]
+
+    # Neighbouring cells share every interior edge; keep one copy of each.
+    swap = (a[:, 0] > b[:, 0]) | ((a[:, 0] == b[:, 0]) & (a[:, 1] > b[:, 1]))
+    key = np.where(swap[:, None], np.concatenate([b, a], axis=1), np.concatenate([a, b], axis=1))
+    _, unique = np.unique(np.round(key, 3), axis=0, return_index=True)
+    a, b = a[unique], b[unique]
+
+    a, b, keep = clip_segments(a, b, 0.0, float(size))
+    a, b = a[keep], b[keep]
+    coords = np.stack([a, b], axis=1).reshape(-1, 2)
+    return PathSet.from_sizes(coords, np.full(len(a), 2))
+
+
+class _CircleGrid:
+    """Spatial hash of circles keyed on every cell their bounding box touches.
+
+    With cells at least as wide as the largest circle, any circle whose edge
+    lies within one cell of a query point is registered in the 3x3 block
+    around it, so each query touches a bounded number of circles.
+    """
+
+    def __init__(self, centres: np.ndarray, radii: np.ndarray, cell: float, cells: int):
+        self.cell, self.cells = cell, cells
+        lo = np.clip(((centres - radii[:, None]) / cell).astype(np.int64), 0, cells - 1)
+        hi = np.clip(((centres + radii[:, None]) / cell).astype(np.int64), 0, cells - 1)
+        span = hi - lo + 1
+
+        counts = span[:, 0] * span[:, 1]
+        circle = np.repeat(np.arange(len(radii)), counts)
+        local = _ranges(np.zeros(len(radii), dtype=np.int64), counts, _offsets_from_sizes(counts))
+        keys = (lo[circle, 1] + local // span[circle, 0]) * cells + lo[circle, 0] + local % span[circle, 0]
+
+        order = np.argsort(keys, kind='stable')
+        self.members = circle[order]
+        self.starts = np.searchsorted(keys[order], np.arange(cells * cells + 1))
+
+    def neighbours(self, points: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Return ``(point, circle)`` pairs for circles registered around each point.
+
+        Pairs come out grouped by point in ascending order.
+        """
+        cells = self.cells
+        gx = (points[:, 0] / self.cell).astype(np.int64)[:, None] + np.array([-1, 0, 1] * 3)
+        gy = (points[:, 1] / self.cell).astype(np.int64)[:, None] + np.repeat([-1, 0, 1], 3)
+        valid = (gx >= 0) & (gx < cells) & (gy >= 0) & (gy < cells)
+        keys = np.where(valid, gy * cells + gx, 0)
+        counts = np.where(valid, self.starts[keys + 1] - self.starts[keys], 0).ravel()
+        pair = np.repeat(np.arange(len(counts)), counts)
+        position = _ranges(self.starts[keys].ravel(), counts, _offsets_from_sizes(counts))
+        return pair // 9, self.members[position]
+
+    def clearance(self, points: np.ndarray, centres: np.ndarray, radii: np.ndarray) -> np.ndarray:
+        """Distance from each point to the nearest registered circle edge, capped at one cell."""
+        query, other = self.neighbours(points)
+        result = np.full(len(points), self.cell)
+        if len(query):
+            gap = np.hypot(*(points[query] - centres[other]).T) - radii[other]
+            first = np.flatnonzero(np.r_[True, query[1:] != query[:-1]])
+            result[query[first]] = np.minimum(result[query[first]], np.minimum.reduceat(gap, first))
+        return result
+
+
+def _cover_disks(covered: np.ndarray, centres: np.ndarray, radii: np.ndarray, pixel: float) -> None:
+    """Mark every raster pixel whose centre lies inside one of the disks."""
+    n = covered.shape[0]
+    lo = np.clip(np.floor((centres - radii[:, None]) / pixel).astype(np.int64), 0, n - 1)
+    hi = np.clip(np.floor((centres + radii[:, None]) / pixel).astype(np.int64), 0, n - 1)
+    span = hi - lo + 1
+    counts = span[:, 0] * span[:, 1]
+    disk = np.repeat(np.arange(len(radii)), counts)
+    local = _ranges(np.zeros(len(radii), dtype=np.int64), counts, _offsets_from_sizes(counts))
+    px = lo[disk, 0] + local % span[disk, 0]
+    py = lo[disk, 1] + local // span[disk, 0]
+    inside = np.hypot((px + 0.5) * pixel - centres[disk, 0], (py + 0.5) * pixel - centres[disk, 1]) <= radii[disk]
+    covered[py[inside], px[inside]] = True
+
+
+def _circle_packing(
+    size: int,
+    complexity: int,
+    scale: float,
+    rng: np.random.Generator,
+    batch: int = 4096,
+) -> PathSet:
+    """Pack non-overlapping circles, each grown until it touches a neighbour or the edge.
+
+    Candidates are drawn in batches from a coverage raster of the space still
+    free, and every candidate takes the largest radius its surroundings
+    allow, looked up through :class:`_CircleGrid`. Within a batch a candidate
+    is dropped if it overlaps a larger one, so accepted circles never
+    intersect.
+    """
+    target = int(complexity * 500 * scale ** 2)
+    r_max = 2 * np.sqrt(size * size / target)
+    r_min = r_max / 10
+    cells = max(int(size / r_max), 1)
+    cell = size / cells
+
+    # Pixels closer than r_min to the edge or to a circle can never seed a new circle.
+    pixel = r_min / 2
+    border = int(np.ceil(r_min / pixel))
+    covered = np.zeros((int(np.ceil(size / pixel)),) * 2, dtype=bool)
+    covered[:border], covered[-border:], covered[:, :border], covered[:, -border:] = True, True, True, True
+
+    centres = np.empty((0, 2))
+    radii = np.empty(0)
+    grid = _CircleGrid(centres, radii, cell, cells)
+    while len(radii) < target:
+        free = np.flatnonzero(~covered.ravel())
+        if not len(free):
+            break
+        # Small batches while few circles are placed keep large candidates from clashing.
+        draw = min(batch, len(free), max(64, (target - len(radii)) // 4))
+        picks = free[rng.integers(len(free), size=draw)]
+        candidates = (np.stack([picks % covered.shape[1], picks // covered.shape[1]], axis=1)
+                      + rng.random((len(picks), 2))) * pixel
+        room = np.minimum(candidates, size - candidates).min(axis=1)
+        room = np.minimum(np.minimum(room, grid.clearance(candidates, centres, radii)), r_max)
+
+        # Pixels that cannot hold a circle are retired so they are not drawn again.
+        ok = room >= r_min
+        covered.ravel()[picks[~ok]] = True
+        candidates, room = candidates[ok], room[ok]
+
+        # Resolve overlaps inside the batch in favour of the larger circle.
+        by_size = np.argsort(-room, kind='stable')
+        candidates, room = candidates[by_size], room[by_size]
+        mine, other = _CircleGrid(candidates, room, cell, cells).neighbours(candidates)
+        clash = (other < mine) & (
+            np.hypot(*(candidates[mine] - candidates[other]).T) < room[mine] + room[other]
+        )
+        accepted = np.bincount(mine[clash], minlength=len(room)) == 0
+
+        centres = np.concatenate([centres, candidates[accepted]])
+        radii = np.concatenate([radii, room[accepted]])
+        _cover_disks(covered, candidates[accepted], room[accepted] + r_min, pixel)
+        grid = _CircleGrid(centres, radii, cell, cells)
+
+    centres, radii = centres[:target], radii[:target]
+    return circle_polylines(centres, radii, tolerance=0.05 * scale)
+
+
+# (axiom, rules, turn angle in degrees) for each L-system preset.
+L_SYSTEM_PRESETS = {
+    'plant': ('X', (('X', 'F+[[X]-X]-F[X]+X'), ('F', 'FF')), 25.0),
+    'bush': ('F', (('F', 'FF-[-F+F+F]+[+F-F-F]'),), 22.5),
+    'weed': ('F', (('F', 'F[+F]F[-F]F'),), 25.7),
+}
+
+
+@functools.lru_cache(maxsize=32)
+def expand_l_system(axiom: str, rules: tuple[tuple[str, str], ...], depth: int) -> np.ndarray:
+    """Rewrite ``axiom`` ``depth`` times and return the symbols as a read-only uint8 array.
+
+    Every level is memoised, so deeper expansions of the same system reuse
+    the shallower ones. Each rewrite is a single gather from a replacement
+    table rather than string concatenation.
+    """
+    if depth == 0:
+        symbols = np.frombuffer(axiom.encode('ascii'), dtype=np.uint8).copy()
     else:
-        img = np.random.rand(size, size) * 255
+        previous = expand_l_system(axiom, rules, depth - 1)
+        table = [bytes([code]) for code in range(256)]
+        for symbol, replacement in rules:
+            table[ord(symbol)] = replacement.encode('ascii')
+        lengths = np.array([len(t) for t in table], dtype=np.int64)
+        flat = np.frombuffer(b''.join(table), dtype=np.uint8)
+        sizes = lengths[previous]
+        position = _ranges((np.cumsum(lengths) - lengths)[previous], sizes, _offsets_from_sizes(sizes))
+        symbols = flat[position]
+    symbols.setflags(write=False)
+    return symbols
+
+
+def _segment_cumsum(values: np.ndarray, first: np.ndarray) -> np.ndarray:
+    """Running sum of ``values`` that restarts wherever ``first`` is set."""
+    total = np.cumsum(values, axis=0)
+    before = (total - values)[first]
+    return total - before[np.cumsum(first) - 1]
+
+
+def interpret_l_system(symbols: np.ndarray, angle: float) -> PathSet:
+    """Run the turtle over an expanded L-system without a per-symbol loop.
+
+    ``F`` draws a unit step, ``f`` moves without drawing, ``+``/``-`` turn
+    by ``angle`` degrees and ``[``/``]`` push and pop the turtle state.
+    Symbols are grouped by bracket depth; within a depth, every branch is a
+    contiguous segment whose heading and position are segmented cumulative
+    sums started from the state saved at its opening ``[``. Straight runs
+    are merged, and each branch becomes one polyline.
+    """
+    relevant = np.zeros(256, dtype=bool)
+    relevant[list(b'Ff+-[]')] = True
+    code = symbols[relevant[symbols]]
+    if not len(code):
+        return PathSet.empty()
+
+    is_open = code == ord('[')
+    depth = np.cumsum(is_open, dtype=np.int32) - np.cumsum(code == ord(']'), dtype=np.int32)
+    level = (depth - is_open).astype(np.int16)
+    order = np.argsort(level, kind='stable')
+    bounds = np.searchsorted(level[order], np.arange(int(level.max()) + 2))
+    turn = np.deg2rad(angle)
+
+    open_at = np.empty(0, dtype=np.int64)
+    open_state = np.array([[np.pi / 2, 0.0, 0.0]])
+    starts, ends, firsts, keeps = [], [], [], []
+    for lv in range(len(bounds) - 1):
+        index = order[bounds[lv]:bounds[lv + 1]]
+        if not len(index):
+            break
+        c = code[index]
+        block = np.searchsorted(open_at, index) - 1 if lv else np.zeros(len(index), dtype=np.int64)
+        first = np.r_[True, block[1:] != block[:-1]]
+        base = open_state[np.maximum(block, 0)]
+
+        delta = np.where(c == ord('+'), turn, 0.0) - np.where(c == ord('-'), turn, 0.0)
+        heading = base[:, 0] + _segment_cumsum(delta, first)
+        moving = (c == ord('F')) | (c == ord('f'))
+        step = np.where(moving[:, None], np.stack([np.cos(heading), np.sin(heading)], axis=1), 0.0)
+        position = base[:, 1:] + _segment_cumsum(step, first)
+
+        opens = c == ord('[')
+        open_at = index[opens]
+        open_state = np.column_stack([heading[opens], position[opens]])
+
+        # A polyline breaks at a new branch or after a pen-up move.
+        draw = c == ord('F')
+        if not draw.any():
+            continue
+        lifts = _segment_cumsum(c == ord('f'), first)[draw]
+        branch = np.cumsum(first)[draw]
+        poly_first = np.r_[True, (branch[1:] != branch[:-1]) | (lifts[1:] != lifts[:-1])]
+        poly_last = np.r_[poly_first[1:], True]
+        turned = np.r_[heading[draw][1:] != heading[draw][:-1], True]
+        starts.append(position[draw] - step[draw])
+        ends.append(position[draw])
+        firsts.append(poly_first)
+        keeps.append(poly_last | turned)
+
+    if not starts:
+        return PathSet.empty()
+    starts, ends = np.concatenate(starts), np.concatenate(ends)
+    firsts, keeps = np.concatenate(firsts), np.concatenate(keeps)
+    emit = np.stack([firsts, keeps], axis=1)
+    coords = np.stack([starts, ends], axis=1)[emit]
+    polyline = np.repeat(np.cumsum(firsts) - 1, emit.sum(axis=1))
+    return PathSet.from_sizes(coords, np.bincount(polyline))
+
+
+def _l_system(
+    size: int,
+    complexity: int,
+    scale: float,
+    rng: np.random.Generator,
+    preset: str = 'plant',
+) -> PathSet:
+    """Branching L-system tree, up to depth 8 at full complexity."""
+    axiom, rules, angle = L_SYSTEM_PRESETS[preset]
+    depth = 1 + complexity * 7 // 10
+    paths = interpret_l_system(expand_l_system(axiom, rules, depth), angle)
+    return _fit_to_canvas(paths, size, flip_y=True)
+
+
+class DisjointSet:
+    """Union-find over ``n`` elements stored in NumPy arrays.
+
+    Lookups chase parents for a whole batch at once and compress every
+    queried path; links always hang the root of lower rank under the higher.
+    """
+
+    def __init__(self, n: int):
+        self.parent = np.arange(n, dtype=np.int64)
+        self.rank = np.zeros(n, dtype=np.int8)
+
+    def find(self, items: np.ndarray) -> np.ndarray:
+        """Return the root of each item, pointing the items straight at their roots."""
+        roots = self.parent[items]
+        while True:
+            up = self.parent[roots]
+            if (up == roots).all():
+                break
+            roots = up
+        self.parent[items] = roots
+        return roots
+
+    def _key(self, roots: np.ndarray) -> np.ndarray:
+        """Order roots by rank, breaking ties with a scrambled index.
+
+        Ties must not follow the index itself, or on a grid only the last
+        element would ever be free to take children in the first round.
+        """
+        return (self.rank[roots].astype(np.int64) << 32) | ((roots * 2654435761) & 0xFFFFFFFF)
+
+    def union(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Link the sets of ``a[i]`` and ``b[i]``, joining every set the pairs connect.
+
+        Returns a mask of the pairs that joined two separate sets; they form
+        a spanning forest of the pairs. Each round, every root hooks under
+        the other root of its earliest pending pair whenever it is the lower
+        of the two by :meth:`_key` and that other root is not hooking
+        elsewhere. Hooks only ever climb that order, so a round can never
+        close a cycle. Earlier pairs win within a round, but the forest is
+        not in general the one linking the pairs one by one in order would
+        give, so this is not an order-faithful Kruskal.
+        """
+        joined = np.zeros(len(a), dtype=bool)
+        pending = np.arange(len(a))
+        first = np.empty(len(self.parent), dtype=np.int64)
+        hooking = np.zeros(len(self.parent), dtype=bool)
+        while len(pending):
+            ra, rb = self.find(a[pending]), self.find(b[pending])
+            apart = ra != rb
+            pending, ra, rb = pending[apart], ra[apart], rb[apart]
+            if not len(pending):
+                break
+
+            ka, kb = self._key(ra), self._key(rb)
+            lower = ka < kb
+            child, root = np.where(lower, ra, rb), np.where(lower, rb, ra)
+            # Reverse order so the earliest pending pair wins each write.
+            first[child[::-1]] = pending[::-1]
+            hook = first[child] == pending
+            # Roots that are hooking elsewhere this round cannot take children, so trees stay shallow.
+            hooking[child[hook]] = True
+            hook &= ~hooking[root]
+            hooking[child] = False
+            child, root = child[hook], root[hook]
+            self.parent[child] = root
+            np.maximum.at(self.rank, root, self.rank[child] + 1)
+            joined[pending[hook]] = True
+            pending = pending[~hook]
+        return joined
+
+
+def _wall_strokes(walls: np.ndarray, horizontal: bool) -> PathSet:
+    """Merge unit walls into one stroke per straight run.
+
+    ``walls[i, j]`` marks the unit wall on grid line ``i`` between
+    positions ``j`` and ``j + 1``.
+    """
+    line, first, last = scanline_runs(walls.view(np.uint8))
+    start = np.stack([first, line], axis=1)
+    stop = np.stack([last + 1, line], axis=1)
+    coords = np.stack([start, stop], axis=1).reshape(-1, 2)
+    if not horizontal:
+        coords = coords[:, ::-1]
+    return PathSet.from_sizes(coords, np.full(len(line), 2))
+
+
+def _maze(size: int, complexity: int, scale: float, rng: np.random.Generator) -> PathSet:
+    """Perfect maze from a random spanning tree of the cell grid, walls merged into long strokes.
+
+    The tree comes from a batched union over shuffled edges; it is not
+    sequential Kruskal, so its bias differs slightly from a Kruskal maze.
+    """
+    n = max(4, int(round(complexity * 6 * scale)))
+    cell = np.arange(n * n).reshape(n, n)
+    # Edges between horizontally adjacent cells, then vertically adjacent ones.
+    a = np.concatenate([cell[:, :-1].ravel(), cell[:-1, :].ravel()])
+    b = np.concatenate([cell[:, 1:].ravel(), cell[1:, :].ravel()])
+    order = rng.permutation(len(a))
+    opened = np.zeros(len(a), dtype=bool)
+    opened[order] = DisjointSet(n * n).union(a[order], b[order])
+
+    split = n * (n - 1)
+    # vertical[x, y]: wall on x = const between rows y and y + 1, and likewise for horizontal[y, x].
+    vertical = np.ones((n + 1, n), dtype=bool)
+    vertical[1:-1] = ~opened[:split].reshape(n, n - 1).T
+    horizontal = np.ones((n + 1, n), dtype=bool)
+    horizontal[1:-1] = ~opened[split:].reshape(n - 1, n)
+    # Entrance at the top-left, exit at the bottom-right.
+    horizontal[0, 0] = horizontal[-1, -1] = False
+
+    paths = PathSet.concatenate([_wall_strokes(horizontal, True), _wall_strokes(vertical, False)])
+    pitch = (size - 20) / n
+    return paths.transform(pitch, (10, 10))
+
+
+# Curve algorithms return ``(curve, t_end, samples)`` and are sampled by :func:`sample_curve`.
+_CURVES = {
+    'spirograph': _spirograph,
+    'sine_waves': _sine_waves,
+    'parametric': _parametric,
+}
+
+# Maximum distance, in plot millimetres, between a sampled curve and the true one.
+CURVE_TOLERANCE_MM = 0.02
+
+_ALGORITHMS = {
+    'flow_field': _flow_field,
+    'voronoi': _voronoi,
+    'circle_packing': _circle_packing,
+    'l_system': _l_system,
+    'maze': _maze,
+}
+
+
+def generate_paths(
+    algorithm: str,
+    complexity: int,
+    scale: float,
+    plot_settings: PlotSettings = DEFAULT_PLOT_SETTINGS,
+    seed: int = 0,
+) -> PathSet:
+    """Generate procedural art as polylines in plot millimetres.
+
+    All randomness comes from a generator created here from ``seed`` and
+    passed down explicitly, so the same seed always gives the same paths and
+    concurrent calls never share random state.
+    """
+    if algorithm not in _ALGORITHMS and algorithm not in _CURVES:
+        raise ValueError(f"Unknown generative algorithm: {algorithm}")
+
+    rng = np.random.default_rng(seed)
+    size = int(200 * scale)
+    plot_size = min(plot_settings.width, plot_settings.height)
+    if algorithm in _CURVES:
+        tolerance = CURVE_TOLERANCE_MM * size / plot_size
+        paths = _curve_art(*_CURVES[algorithm](complexity, scale, rng), size, tolerance)
+    else:
+        paths = _ALGORITHMS[algorithm](size, complexity, scale, rng)
+
+    # Fit the square canvas to the plot area, centred on the short side.
+    offset = ((plot_settings.width - plot_size) / 2, (plot_settings.height - plot_size) / 2)
+    paths = paths.transform(plot_size / size, offset)
 
-    logger.debug("Generated %s art with complexity=%s scale=%s", algorithm, complexity, scale)
-    return Image.fromarray(img.astype(np.uint8), mode='L')
+    logger.debug(
+        "Generated %s art with complexity=%s scale=%s seed=%s: %d paths, %d points",
+        algorithm, complexity, scale, seed, len(paths), paths.num_points,
+    )
+    return paths
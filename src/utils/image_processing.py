@@ -2,15 +2,30 @@
 from __future__ import annotations
 
 import logging
-from typing import List, Tuple
-
 import cv2
 import numpy as np
 from PIL import Image
 
+from src.constants import DEFAULT_IMAGE_SETTINGS, PlotSettings
+from src.utils.fills import distance_field, hatch_fill
+from src.utils.paths import PathSet
+from src.utils.stipple import stipple_tour
+
 logger = logging.getLogger(__name__)
 
 
+def _adjust(img: Image.Image, brightness: int, contrast: int) -> np.ndarray:
+    return cv2.convertScaleAbs(np.array(img), alpha=1 + contrast / 100, beta=brightness)
+
+
+def adjust_tone(img: Image.Image, brightness: int, contrast: int, invert: bool) -> Image.Image:
+    """Apply brightness, contrast and inversion only, keeping the grey levels stippling needs."""
+    img_array = _adjust(img, brightness, contrast)
+    if invert:
+        img_array = 255 - img_array
+    return Image.fromarray(img_array, mode='L')
+
+
 def apply_filters(
     img: Image.Image,
     brightness: int,
@@ -20,8 +35,7 @@ def apply_filters(
     edge_method: str,
 ) -> Image.Image:
     """Apply image processing filters."""
-    img_array = np.array(img)
-    img_array = cv2.convertScaleAbs(img_array, alpha=1 + contrast / 100, beta=brightness)
+    img_array = _adjust(img, brightness, contrast)
 
     if edge_method == 'canny':
         img_array = cv2.Canny(img_array, threshold, threshold * 2)
@@ -41,9 +55,57 @@ def apply_filters(
     return Image.fromarray(img_array, mode='L')
 
 
-def extract_paths(img: Image.Image, method: str) -> List[Tuple[int, int]]:
-    """Extract vector paths from image.
+def ink_mask(img: Image.Image) -> np.ndarray:
+    """Return a uint8 mask that is 1 wherever the processed image is dark.
+
+    Dark pixels are the ones the pen draws, matching the processed preview.
+    """
+    return (np.asarray(img) < 128).view(np.uint8)
+
+
+def trace_contours(mask: np.ndarray) -> PathSet:
+    """Trace the boundaries of a binary mask as closed polylines."""
+    contours, _ = cv2.findContours(mask, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    return PathSet.from_rings(contours)
+
+
+def extract_paths(
+    img: Image.Image,
+    method: str,
+    hatch_spacing: float = DEFAULT_IMAGE_SETTINGS.hatch_spacing,
+    hatch_angle: float = DEFAULT_IMAGE_SETTINGS.hatch_angle,
+    hatch_link: bool = DEFAULT_IMAGE_SETTINGS.hatch_link,
+    stipple_points: int = DEFAULT_IMAGE_SETTINGS.stipple_points,
+    tone: Image.Image | None = None,
+) -> PathSet:
+    """Extract vector paths, in pixel coordinates, from a processed image.
 
-    TODO: Implement real path extraction using cv2.findContours or similar.
+    Stippling takes its darkness from ``tone``, the image before
+    thresholding (see :func:`adjust_tone`), so dot density follows the grey
+    levels; it falls back to ``img`` when no tone image is given.
     """
-    raise NotImplementedError("Path extraction not implemented")
+    mask = ink_mask(img)
+
+    if method == 'contour':
+        paths = trace_contours(mask)
+    elif method == 'hatch':
+        paths = hatch_fill(mask, hatch_spacing, hatch_angle, link=hatch_link)
+    elif method == 'spiral':
+        paths = distance_field(mask).spiral(hatch_spacing)
+    elif method == 'concentric':
+        paths = distance_field(mask).concentric(hatch_spacing)
+    elif method == 'stipple':
+        darkness = 1.0 - np.asarray(img if tone is None else tone, dtype=np.float32) / 255.0
+        paths = stipple_tour(darkness, stipple_points)
+    else:
+        raise ValueError(f"Unknown vectorization method: {method}")
+
+    logger.debug("Extracted %d paths (%d points) with method=%s", len(paths), paths.num_points, method)
+    return paths
+
+
+def scale_to_plot(paths: PathSet, image_size: tuple[int, int], plot_settings: PlotSettings) -> PathSet:
+    """Map pixel-space paths into plot millimetres, fitting the image to the plot area."""
+    width, height = image_size
+    scale = min(plot_settings.width / max(width, 1), plot_settings.height / max(height, 1))
+    return paths.transform(scale)
@@ -0,0 +1,107 @@
+"""Server-side store for uploaded images.
+
+Uploads are decoded once and kept here under a hash of their file bytes, so
+browser stores only carry the short key and callbacks skip the base64
+round trip and the decode on every interaction.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+from PIL import Image
+
+from src.utils.lru import ByteLRU
+
+logger = logging.getLogger(__name__)
+
+# Memory budget for decoded images held by the default store.
+IMAGE_STORE_BYTES = 512 * 1024 * 1024
+
+_KEY_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+
+class ImageStore:
+    """Content-addressed LRU of decoded grayscale images.
+
+    Images live in memory as uint8 arrays until their total size exceeds
+    ``max_bytes``; the least recently used ones are then evicted, first being
+    written to ``spill_dir`` when one is given so they can be reloaded later
+    instead of lost.
+    """
+
+    def __init__(self, max_bytes: int = IMAGE_STORE_BYTES, spill_dir: str | None = None):
+        self.spill_dir = spill_dir
+        self._images: ByteLRU[str, np.ndarray] = ByteLRU(max_bytes, lambda pixels: pixels.nbytes, self._spill)
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    @staticmethod
+    def key_for(data: bytes) -> str:
+        """Content hash used as the key for an encoded image file."""
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def put(self, data: bytes) -> str:
+        """Decode an encoded image file, store it and return its key."""
+        key = self.key_for(data)
+        if key in self:
+            return key
+        pixels = np.asarray(Image.open(io.BytesIO(data)).convert('L'))
+        self._insert(key, pixels)
+        logger.debug("Stored image %s (%dx%d)", key, pixels.shape[1], pixels.shape[0])
+        return key
+
+    def get(self, key: str) -> Image.Image | None:
+        """Return the stored image for ``key``, or ``None`` if it is unknown or was dropped."""
+        pixels = self._images.get(key)
+        if pixels is None:
+            pixels = self._load_spilled(key)
+            if pixels is None:
+                return None
+            self._insert(key, pixels)
+        return Image.fromarray(pixels)
+
+    def __contains__(self, key: str) -> bool:
+        if key in self._images:
+            return True
+        path = self._spill_path(key)
+        return path is not None and os.path.exists(path)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by images currently in memory."""
+        return self._images.nbytes
+
+    def _insert(self, key: str, pixels: np.ndarray) -> None:
+        pixels.setflags(write=False)
+        self._images.put(key, pixels)
+
+    def _spill_path(self, key: str) -> str | None:
+        # Keys come back from the browser, so only well-formed hashes may name a file.
+        if not self.spill_dir or not _KEY_PATTERN.fullmatch(key):
+            return None
+        return os.path.join(self.spill_dir, f"{key}.npy")
+
+    def _spill(self, key: str, pixels: np.ndarray) -> None:
+        path = self._spill_path(key)
+        if path is None or os.path.exists(path):
+            return
+        # Write then rename, so a reader never sees a partial file.
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(partial, 'wb') as handle:
+            np.save(handle, pixels)
+        os.replace(partial, path)
+
+    def _load_spilled(self, key: str) -> np.ndarray | None:
+        path = self._spill_path(key)
+        if path is None or not os.path.exists(path):
+            return None
+        return np.load(path)
+
+
+image_store = ImageStore(spill_dir=os.environ.get('PLOTTER_IMAGE_SPILL_DIR'))
@@ -0,0 +1,79 @@
+"""Server-side store for finished plot jobs.
+
+The page callbacks register the ordered paths they produced here and hand
+only the job key to the browser, so exports are built from the job on the
+server instead of round-tripping path data through a ``dcc.Store``.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+from dataclasses import dataclass, field
+
+from src.utils.arcs import ArcPaths, ArcStats, fit_arcs
+from src.utils.lru import ByteLRU
+from src.utils.paths import PathSet
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the path data held by the default store.
+JOB_STORE_BYTES = 256 * 1024 * 1024
+
+
+@dataclass
+class _Job:
+    """A job's paths and its arc fits, by tolerance."""
+    paths: PathSet
+    arcs: dict[float, tuple[ArcPaths, ArcStats]] = field(default_factory=dict)
+
+    @property
+    def nbytes(self) -> int:
+        return self.paths.nbytes + sum(fitted[0].nbytes for fitted in self.arcs.values())
+
+
+class JobStore:
+    """LRU of plot jobs, bounded by the size of their path buffers.
+
+    Arc fits of a job are kept alongside it, one per tolerance, and are
+    dropped with it.
+    """
+
+    def __init__(self, max_bytes: int = JOB_STORE_BYTES):
+        self._jobs: ByteLRU[str, _Job] = ByteLRU(max_bytes, lambda job: job.nbytes)
+
+    @staticmethod
+    def key_for(paths: PathSet) -> str:
+        """Content hash of a path set, used when no key is given."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(paths.offsets.tobytes())
+        digest.update(paths.coords.tobytes())
+        return digest.hexdigest()
+
+    def put(self, paths: PathSet, key: str | None = None) -> str:
+        """Store a job's paths and return its key."""
+        key = key or self.key_for(paths)
+        if self._jobs.get(key) is None:
+            self._jobs.put(key, _Job(paths))
+            logger.debug("Stored job %s (%d paths)", key, len(paths))
+        return key
+
+    def get(self, key: str) -> PathSet | None:
+        """Return the paths of job ``key``, or ``None`` if it is unknown or was dropped."""
+        job = self._jobs.get(key)
+        return job.paths if job is not None else None
+
+    def arcs(self, key: str, tolerance: float) -> tuple[ArcPaths, ArcStats] | None:
+        """Arc-fitted moves of job ``key`` and their stats, or ``None`` if the job is gone."""
+        job = self._jobs.get(key)
+        if job is None:
+            return None
+        fitted = job.arcs.get(tolerance)
+        if fitted is None:
+            fitted = job.arcs.setdefault(tolerance, fit_arcs(job.paths, tolerance))
+            # Storing the job again re-measures it with the new fit.
+            if key in self._jobs:
+                self._jobs.put(key, job)
+        return fitted
+
+
+job_store = JobStore()
@@ -0,0 +1,145 @@
+"""Job-time estimation for the CNC Pen Plotter application.
+
+:func:`estimate_job` walks the moves the G-code export would send, the
+pen-up travel from home and between paths, the pen lifts and every
+drawing segment, and times them with a trapezoidal acceleration profile
+like a GRBL-style planner's. Corner speeds follow the planner's junction
+deviation rule and the look-ahead passes are folded into cumulative
+minimums, so whole jobs are timed in a few array operations.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.constants import PlotSettings
+from src.utils.paths import PathSet
+
+logger = logging.getLogger(__name__)
+
+# How far, in mm, the planner lets a corner be cut when picking its speed; GRBL's default.
+JUNCTION_DEVIATION_MM = 0.01
+
+
+@dataclass
+class JobEstimate:
+    """Distances, pen lifts and running time of a plot job."""
+    draw_distance: float
+    travel_distance: float
+    pen_lifts: int
+    duration: float  # seconds
+
+    @property
+    def duration_text(self) -> str:
+        """Duration as hours, minutes and seconds, e.g. ``'1h 05m'`` or ``'4m 12s'``."""
+        seconds = round(self.duration)
+        hours, rest = divmod(seconds, 3600)
+        minutes, seconds = divmod(rest, 60)
+        if hours:
+            return f"{hours}h {minutes:02d}m"
+        if minutes:
+            return f"{minutes}m {seconds:02d}s"
+        return f"{seconds}s"
+
+
+def _move_times(
+    length: np.ndarray,
+    entry: np.ndarray,
+    leave: np.ndarray,
+    top: float,
+    acceleration: float,
+) -> np.ndarray:
+    """Time of each straight move that speeds up from ``entry``, cruises at ``top`` at most and slows to ``leave``.
+
+    Speeds are in mm/s and must be reachable from each other within the
+    move's length; short moves peak below ``top`` in a triangular profile.
+    """
+    entry2, leave2 = entry ** 2, leave ** 2
+    peak = np.sqrt(np.minimum(top ** 2, acceleration * length + (entry2 + leave2) / 2))
+    ramps = (2 * peak - entry - leave) / acceleration
+    cruise = length - (2 * peak ** 2 - entry2 - leave2) / (2 * acceleration)
+    return ramps + np.where(peak > 0, np.maximum(cruise, 0.0) / np.where(peak > 0, peak, 1.0), 0.0)
+
+
+def _junction_speeds(coords: np.ndarray, drawn: np.ndarray, top: float, acceleration: float) -> np.ndarray:
+    """Largest speed the planner allows at every vertex, zero where the pen starts or stops.
+
+    ``drawn[i]`` says whether the move from vertex ``i`` to ``i + 1`` is a
+    drawing move within one path.
+    """
+    step = np.diff(coords, axis=0)
+    length = np.hypot(*step.T)
+    unit = step / np.where(length > 0, length, 1.0)[:, None]
+    cap = np.zeros(len(coords))
+    through = drawn[:-1] & drawn[1:]
+    # Sine of half the angle between the moves, as in GRBL: 1 straight on, 0 when reversing.
+    cos_turn = -(unit[:-1] * unit[1:]).sum(axis=1)
+    sin_half = np.sqrt(np.clip(0.5 * (1 - cos_turn), 0.0, 1.0))
+    with np.errstate(divide='ignore'):
+        corner = acceleration * JUNCTION_DEVIATION_MM * sin_half / (1 - sin_half)
+    cap[1:-1] = np.where(through, np.sqrt(np.minimum(corner, top ** 2)), 0.0)
+    return cap
+
+
+def estimate_job(paths: PathSet, plot_settings: PlotSettings) -> JobEstimate:
+    """Estimate how long a job takes to plot, moving as the exported G-code does.
+
+    The pen starts lifted at home and is lifted and lowered by
+    ``pen_lift_height`` around every path. Drawing moves run at
+    ``feed_rate`` and rapid moves at ``travel_rate``, both limited by
+    ``acceleration``. Consecutive drawing moves keep their speed through
+    gentle corners; every other move starts and ends at rest.
+    """
+    acceleration = float(plot_settings.acceleration)
+    feed = plot_settings.feed_rate / 60
+    rapid = plot_settings.travel_rate / 60
+    paths = paths.take(np.flatnonzero(paths.sizes > 0))
+    if not len(paths):
+        return JobEstimate(0.0, 0.0, 0, 0.0)
+
+    coords = paths.coords.astype(np.float64)
+    owner = paths.path_ids()
+    drawn = owner[:-1] == owner[1:]
+    segment = np.where(drawn, np.hypot(*np.diff(coords, axis=0).T), 0.0)
+    length = segment[drawn]
+
+    # Speed limits from the path's own corners and its rest at both ends.
+    cap = _junction_speeds(coords, drawn, feed, acceleration)
+    cap[paths.offsets[:-1]] = 0.0
+    cap[paths.offsets[1:] - 1] = 0.0
+
+    # Look-ahead as cumulative minimums: a vertex can be no faster than any
+    # earlier cap allows after accelerating over the distance between them,
+    # v_j^2 <= cap_i^2 + 2a(s_j - s_i), and likewise for later caps when
+    # braking. Each path starts and ends at rest, so no bound crosses paths.
+    along = np.zeros(len(coords))
+    along[1:] = np.cumsum(segment)
+    reach = 2 * acceleration * along
+    speed2 = np.minimum(
+        reach + np.minimum.accumulate(cap ** 2 - reach),
+        np.minimum.accumulate((cap ** 2 + reach)[::-1])[::-1] - reach,
+    )
+    speed = np.sqrt(np.maximum(speed2, 0.0))
+    draw_time = _move_times(length, speed[:-1][drawn], speed[1:][drawn], feed, acceleration).sum()
+
+    # Rapid moves from home to the first path and between paths, and a lift and drop per path.
+    previous = np.vstack([np.zeros((1, 2)), coords[paths.offsets[1:-1] - 1]])
+    hops = np.hypot(*(coords[paths.offsets[:-1]] - previous).T)
+    rest = np.zeros(len(hops))
+    travel_time = _move_times(hops, rest, rest, rapid, acceleration).sum()
+    lift = float(plot_settings.pen_lift_height)
+    lift_time = _move_times(np.array([lift]), np.zeros(1), np.zeros(1), rapid, acceleration)[0]
+
+    estimate = JobEstimate(
+        draw_distance=float(length.sum()),
+        travel_distance=float(hops.sum()),
+        pen_lifts=len(paths),
+        duration=float(draw_time + travel_time + lift_time * (2 * len(paths) + 1)),
+    )
+    logger.debug(
+        "Estimated job: %.0fmm drawn, %.0fmm travel, %d lifts, %.0fs",
+        estimate.draw_distance, estimate.travel_distance, estimate.pen_lifts, estimate.duration,
+    )
+    return estimate
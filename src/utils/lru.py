@@ -0,0 +1,80 @@
+"""Byte-bounded LRU shared by the server-side stores and caches."""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, TypeVar
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+class ByteLRU(Generic[K, V]):
+    """Thread-safe LRU holding entries until their total size exceeds ``max_bytes``.
+
+    ``size`` gives the bytes held by a value. The newest entry is always
+    kept, even if it alone exceeds the budget. ``on_evict`` is called with
+    each evicted key and value, e.g. to write it somewhere it can be
+    reloaded from.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        size: Callable[[V], int],
+        on_evict: Callable[[K, V], None] | None = None,
+    ):
+        self.max_bytes = max_bytes
+        self._size = size
+        self._on_evict = on_evict
+        self._entries: OrderedDict[K, V] = OrderedDict()
+        self._sizes: dict[K, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: K) -> V | None:
+        """Return the value for ``key`` and mark it most recently used, or ``None``."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def peek(self, key: K) -> V | None:
+        """Return the value for ``key`` without changing its recency, or ``None``."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key: K, value: V) -> V:
+        """Store ``value`` as the newest entry, re-measuring it if ``key`` was already held."""
+        size = self._size(value)
+        with self._lock:
+            self._bytes += size - self._sizes.get(key, 0)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, old = self._entries.popitem(last=False)
+                self._bytes -= self._sizes.pop(old_key)
+                if self._on_evict is not None:
+                    self._on_evict(old_key, old)
+        return value
+
+    def __contains__(self, key: K) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the entries."""
+        return self._bytes
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
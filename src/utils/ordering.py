@@ -0,0 +1,263 @@
+"""Pen-travel optimisation for the CNC Pen Plotter application.
+
+Paths are reordered, and optionally reversed, so the pen-up moves between
+them are as short as practical before the toolpath is exported.
+"""
+from __future__ import annotations
+
+import logging
+import math
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+
+from src.utils.paths import PathSet
+
+logger = logging.getLogger(__name__)
+
+# Nearest-neighbour steps between calls to a run's ``check``.
+_CHECK_EVERY = 4096
+
+
+@dataclass
+class OrderingStats:
+    """Pen-up travel before and after reordering, in path units."""
+    travel_before: float
+    travel_after: float
+
+    @property
+    def saving(self) -> float:
+        """Fraction of the original travel that was removed."""
+        if self.travel_before <= 0:
+            return 0.0
+        return 1.0 - self.travel_after / self.travel_before
+
+
+def travel_distance(paths: PathSet, origin=(0.0, 0.0)) -> float:
+    """Total pen-up distance from ``origin`` through the paths in their current order."""
+    if not len(paths):
+        return 0.0
+    origin = np.asarray(origin, dtype=np.float64).reshape(1, 2)
+    ends = np.concatenate([origin, paths.ends[:-1].astype(np.float64)])
+    return float(np.hypot(*(paths.starts - ends).T).sum())
+
+
+class _EndpointGrid:
+    """Uniform grid over path endpoints supporting nearest unvisited lookups.
+
+    Endpoint ``e`` belongs to path ``e % n``; visited paths are skipped lazily
+    and dropped from their buckets the next time those buckets are scanned.
+    """
+
+    def __init__(self, points: np.ndarray, ids: np.ndarray, n: int):
+        self.n = n
+        lo = points[ids].min(axis=0)
+        hi = points[ids].max(axis=0)
+        extent = np.maximum(hi - lo, 1e-6)
+        # Aim for roughly two endpoints per cell.
+        self.cell = max(math.sqrt(float(extent[0] * extent[1]) * 2 / len(ids)), float(extent.max()) / 4096, 1e-6)
+        self.x0, self.y0 = float(lo[0]), float(lo[1])
+        cells = ((points[ids] - lo) / self.cell).astype(np.int64)
+        self.nx = int(cells[:, 0].max()) + 1
+        self.ny = int(cells[:, 1].max()) + 1
+
+        keys = cells[:, 1] * self.nx + cells[:, 0]
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        split = np.flatnonzero(np.diff(keys)) + 1
+        self.buckets = dict(zip(
+            keys[np.r_[0, split]].tolist(),
+            [b.tolist() for b in np.split(ids[order], split)],
+        ))
+        self.size = len(ids)
+
+    def nearest(self, x: float, y: float, xs: list, ys: list, visited: bytearray):
+        """Return ``(endpoint, distance)`` of the closest unvisited endpoint, or ``(None, inf)``."""
+        cell, n, nx, ny = self.cell, self.n, self.nx, self.ny
+        buckets = self.buckets
+        fx = (x - self.x0) / cell
+        fy = (y - self.y0) / cell
+        cx = int(math.floor(fx))
+        cy = int(math.floor(fy))
+        limit = max(abs(cx), abs(cx - nx), abs(cy), abs(cy - ny)) + 1
+        # Distance, in cells, from the query to the nearest edge of its own cell.
+        margin = min(fx - cx, cx + 1 - fx, fy - cy, cy + 1 - fy)
+
+        best, best_d2 = None, math.inf
+        for r in range(limit + 1):
+            for gy in range(max(cy - r, 0), min(cy + r, ny - 1) + 1):
+                on_edge = gy == cy - r or gy == cy + r
+                step = 1 if on_edge else 2 * r
+                for gx in range(cx - r, cx + r + 1, max(step, 1)):
+                    if gx < 0 or gx >= nx:
+                        continue
+                    key = gy * nx + gx
+                    bucket = buckets.get(key)
+                    if not bucket:
+                        continue
+                    alive = [e for e in bucket if not visited[e % n]]
+                    if len(alive) != len(bucket):
+                        buckets[key] = alive
+                    for e in alive:
+                        d2 = (xs[e] - x) ** 2 + (ys[e] - y) ** 2
+                        if d2 < best_d2:
+                            best, best_d2 = e, d2
+            # Anything beyond ring r is at least r + margin cells away from the query.
+            if best is not None and best_d2 <= ((r + margin) * cell) ** 2:
+                break
+        return best, math.sqrt(best_d2)
+
+
+def _nearest_neighbour(
+    paths: PathSet, origin, reverse: bool, check: Callable[[], None] | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Greedy nearest-neighbour tour over path endpoints, calling ``check`` every few thousand steps."""
+    n = len(paths)
+    points = paths.starts.astype(np.float64)
+    if reverse:
+        points = np.concatenate([points, paths.ends.astype(np.float64)])
+    xs = points[:, 0].tolist()
+    ys = points[:, 1].tolist()
+    ends_x = paths.ends[:, 0].astype(np.float64).tolist()
+    ends_y = paths.ends[:, 1].astype(np.float64).tolist()
+    starts_x = points[:n, 0].tolist()
+    starts_y = points[:n, 1].tolist()
+
+    visited = bytearray(n)
+    order = np.empty(n, dtype=np.int64)
+    flipped = np.zeros(n, dtype=bool)
+    grid = _EndpointGrid(points, np.arange(len(points)), n)
+    x, y = float(origin[0]), float(origin[1])
+
+    for step in range(n):
+        if check is not None and step % _CHECK_EVERY == 0:
+            check()
+        remaining = n - step
+        # Rebuild on a coarser grid as the field thins out so lookups stay local.
+        if remaining * (2 if reverse else 1) * 4 < grid.size and remaining > 64:
+            alive = np.flatnonzero(np.frombuffer(bytes(visited), dtype=np.uint8) == 0)
+            ids = np.concatenate([alive, alive + n]) if reverse else alive
+            grid = _EndpointGrid(points, ids, n)
+
+        e, _ = grid.nearest(x, y, xs, ys, visited)
+        index = e % n
+        visited[index] = 1
+        order[step] = index
+        if e >= n:
+            flipped[step] = True
+            x, y = starts_x[index], starts_y[index]
+        else:
+            x, y = ends_x[index], ends_y[index]
+    return order, flipped
+
+
+def _two_opt(
+    starts: np.ndarray, ends: np.ndarray, origin, window: int, max_passes: int,
+    check: Callable[[], None] | None = None,
+):
+    """Windowed 2-opt over an oriented path sequence.
+
+    Reversing positions ``i + 1..j`` also flips every path in that block, so
+    only the two boundary links change length. All windows are scored at
+    once and a non-overlapping set of improving moves is applied per pass.
+    ``check`` is called before each pass. Returns the permutation of
+    positions and a mask of flipped positions.
+    """
+    n = len(starts)
+    perm = np.arange(n)
+    flipped = np.zeros(n, dtype=bool)
+    origin = np.asarray(origin, dtype=np.float64).reshape(1, 2)
+    starts, ends = starts.copy(), ends.copy()
+
+    for _ in range(max_passes):
+        if check is not None:
+            check()
+        # Position 0 is the fixed pen start, positions 1..n are the paths.
+        sx, sy = np.r_[origin[0, 0], starts[:, 0]], np.r_[origin[0, 1], starts[:, 1]]
+        ex, ey = np.r_[origin[0, 0], ends[:, 0]], np.r_[origin[0, 1], ends[:, 1]]
+        # link[i] is the current move out of position i; the last path has none.
+        link = np.r_[np.hypot(ex[:-1] - sx[1:], ey[:-1] - sy[1:]), 0.0]
+
+        moves_i, moves_j, gains = [], [], []
+        for k in range(1, min(window, n) + 1):
+            m = n + 1 - k
+            old = link[:m] + link[k:]
+            new = np.hypot(ex[:m] - ex[k:], ey[:m] - ey[k:])
+            # Only blocks that stop before the last path gain a new outgoing move.
+            new[:m - 1] += np.hypot(sx[1:m] - sx[k + 1:], sy[1:m] - sy[k + 1:])
+            gain = old - new
+            better = np.flatnonzero(gain > 1e-9)
+            moves_i.append(better)
+            moves_j.append(better + k)
+            gains.append(gain[better])
+
+        moves_i = np.concatenate(moves_i)
+        if not len(moves_i):
+            break
+        moves_j = np.concatenate(moves_j)
+        by_gain = np.argsort(-np.concatenate(gains), kind='stable')
+
+        taken = bytearray(n + 2)
+        chosen_i, chosen_j = [], []
+        for i, j in zip(moves_i[by_gain].tolist(), moves_j[by_gain].tolist()):
+            if any(taken[i:j + 1]):
+                continue
+            taken[i:j + 1] = b'\x01' * (j + 1 - i)
+            chosen_i.append(i)
+            chosen_j.append(j)
+
+        # Apply every chosen block reversal in one gather, in path positions (0-based).
+        a = np.asarray(chosen_i, dtype=np.int64)
+        b = np.asarray(chosen_j, dtype=np.int64) - 1
+        sizes = b - a + 1
+        block = np.repeat(np.arange(len(a)), sizes)
+        pos = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes) + a[block]
+        step = np.arange(n)
+        step[pos] = a[block] + b[block] - pos
+
+        perm = perm[step]
+        flipped = flipped[step]
+        flipped[pos] = ~flipped[pos]
+        starts, ends = starts[step], ends[step]
+        starts[pos], ends[pos] = ends[pos], starts[pos].copy()
+
+    return perm, flipped
+
+
+def optimize_path_order(
+    paths: PathSet,
+    origin=(0.0, 0.0),
+    reverse: bool = True,
+    two_opt_window: int = 32,
+    two_opt_passes: int = 8,
+    check: Callable[[], None] | None = None,
+) -> tuple[PathSet, OrderingStats]:
+    """Reorder paths to minimise pen-up travel.
+
+    A nearest-neighbour tour is built over a grid index of path endpoints,
+    entering a path from whichever end is closer when ``reverse`` is set.
+    When reversal is allowed the tour is then refined by a windowed 2-opt
+    pass limited to ``two_opt_window`` positions and ``two_opt_passes`` rounds.
+    ``check`` is called now and then during both, so a caller can abort a
+    long run by raising from it.
+    """
+    before = travel_distance(paths, origin)
+    if len(paths) < 2:
+        return paths, OrderingStats(before, before)
+
+    order, flipped = _nearest_neighbour(paths, origin, reverse, check)
+    if reverse and two_opt_window > 0 and two_opt_passes > 0:
+        starts = np.where(flipped[:, None], paths.ends[order], paths.starts[order]).astype(np.float64)
+        ends = np.where(flipped[:, None], paths.starts[order], paths.ends[order]).astype(np.float64)
+        perm, flips = _two_opt(starts, ends, origin, two_opt_window, two_opt_passes, check)
+        order = order[perm]
+        flipped = flipped[perm] ^ flips
+
+    ordered = paths.take(order, reverse=flipped)
+    stats = OrderingStats(before, travel_distance(ordered, origin))
+    logger.debug(
+        "Reordered %d paths: pen-up travel %.1f -> %.1f (%.0f%% saved)",
+        len(paths), stats.travel_before, stats.travel_after, stats.saving * 100,
+    )
+    return ordered, stats
@@ -0,0 +1,225 @@
+"""Array-backed polyline storage for the CNC Pen Plotter application."""
+from __future__ import annotations
+
+import logging
+from typing import Iterable, Iterator, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+COORD_DTYPE = np.float32
+OFFSET_DTYPE = np.int64
+
+
+class PathSet:
+    """A collection of polylines stored in two flat arrays.
+
+    ``coords`` is a float32 ``(N, 2)`` buffer holding the vertices of every
+    path back to back and ``offsets`` is an int64 ``(P + 1,)`` array of path
+    boundaries, so path ``i`` is ``coords[offsets[i]:offsets[i + 1]]``.
+    Indexing a single path or slicing a contiguous range of paths returns
+    views into ``coords`` rather than copies.
+    """
+
+    __slots__ = ('coords', 'offsets')
+
+    def __init__(self, coords: np.ndarray | None = None, offsets: np.ndarray | None = None):
+        if coords is None:
+            coords = np.empty((0, 2), dtype=COORD_DTYPE)
+        if offsets is None:
+            offsets = np.zeros(1, dtype=OFFSET_DTYPE)
+
+        coords = np.asarray(coords, dtype=COORD_DTYPE).reshape(-1, 2)
+        offsets = np.asarray(offsets, dtype=OFFSET_DTYPE)
+        if offsets.ndim != 1 or len(offsets) == 0 or offsets[0] != 0 or offsets[-1] != len(coords):
+            raise ValueError("offsets must start at 0 and end at the number of vertices")
+
+        self.coords = coords
+        self.offsets = offsets
+
+    @classmethod
+    def empty(cls) -> PathSet:
+        """Return a path set with no paths."""
+        return cls()
+
+    @classmethod
+    def from_polylines(cls, polylines: Iterable[np.ndarray | Sequence]) -> PathSet:
+        """Build a path set from an iterable of ``(n, 2)`` vertex arrays.
+
+        Polylines without any vertices are dropped.
+        """
+        arrays = [np.asarray(p, dtype=COORD_DTYPE).reshape(-1, 2) for p in polylines]
+        arrays = [a for a in arrays if len(a)]
+        if not arrays:
+            return cls.empty()
+        sizes = np.fromiter((len(a) for a in arrays), dtype=OFFSET_DTYPE, count=len(arrays))
+        return cls(np.concatenate(arrays), _offsets_from_sizes(sizes))
+
+    @classmethod
+    def from_rings(cls, rings: Sequence[np.ndarray]) -> PathSet:
+        """Build a path set of closed polylines from ring vertex arrays.
+
+        Each ring is closed by repeating its first vertex after its last one,
+        so ``cv2.findContours`` output can be passed straight in.
+        """
+        if not len(rings):
+            return cls.empty()
+        sizes = np.fromiter(map(len, rings), dtype=OFFSET_DTYPE, count=len(rings))
+        points = np.concatenate(rings).reshape(-1, 2)
+        ends = np.cumsum(sizes)
+        points = np.insert(points, ends, points[ends - sizes], axis=0)
+        return cls(points, _offsets_from_sizes(sizes + 1))
+
+    @classmethod
+    def from_sizes(cls, coords: np.ndarray, sizes: np.ndarray) -> PathSet:
+        """Build a path set from a flat vertex buffer and per-path vertex counts."""
+        return cls(coords, _offsets_from_sizes(np.asarray(sizes, dtype=OFFSET_DTYPE)))
+
+    @classmethod
+    def concatenate(cls, pathsets: Iterable[PathSet]) -> PathSet:
+        """Join several path sets into one, preserving path order."""
+        pathsets = [p for p in pathsets if len(p)]
+        if not pathsets:
+            return cls.empty()
+        if len(pathsets) == 1:
+            return pathsets[0]
+        coords = np.concatenate([p.coords for p in pathsets])
+        sizes = np.concatenate([p.sizes for p in pathsets])
+        return cls(coords, _offsets_from_sizes(sizes))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        coords = self.coords
+        bounds = self.offsets.tolist()
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            yield coords[start:stop]
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            index = range(len(self))[key]
+            return self.coords[self.offsets[index]:self.offsets[index + 1]]
+
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                stop = max(start, stop)
+                first = self.offsets[start]
+                return PathSet(
+                    self.coords[first:self.offsets[stop]],
+                    self.offsets[start:stop + 1] - first,
+                )
+            key = np.arange(start, stop, step)
+
+        return self.take(key)
+
+    def __repr__(self) -> str:
+        return f"PathSet(paths={len(self)}, points={self.num_points})"
+
+    @property
+    def sizes(self) -> np.ndarray:
+        """Number of vertices in each path."""
+        return np.diff(self.offsets)
+
+    @property
+    def num_points(self) -> int:
+        """Total number of vertices across all paths."""
+        return len(self.coords)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the coordinate and offset buffers."""
+        return self.coords.nbytes + self.offsets.nbytes
+
+    @property
+    def starts(self) -> np.ndarray:
+        """First vertex of every path as a ``(P, 2)`` array."""
+        return self.coords[self.offsets[:-1]]
+
+    @property
+    def ends(self) -> np.ndarray:
+        """Last vertex of every path as a ``(P, 2)`` array."""
+        return self.coords[self.offsets[1:] - 1]
+
+    def path_ids(self) -> np.ndarray:
+        """Index of the owning path for every vertex."""
+        return np.repeat(np.arange(len(self), dtype=OFFSET_DTYPE), self.sizes)
+
+    def take(self, indices, reverse=None) -> PathSet:
+        """Gather the given paths into a new, compacted path set.
+
+        ``reverse`` is an optional boolean array, aligned with ``indices``,
+        marking paths whose vertex order should be flipped.
+        """
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        indices = indices.astype(OFFSET_DTYPE, copy=False)
+        if len(indices) == 0:
+            return PathSet.empty()
+
+        sizes = self.sizes[indices]
+        offsets = _offsets_from_sizes(sizes)
+        vertex_index = _ranges(self.offsets[indices], sizes, offsets)
+        if reverse is not None:
+            flip = np.repeat(np.asarray(reverse, dtype=bool), sizes)
+            local = vertex_index - np.repeat(self.offsets[indices], sizes)
+            vertex_index[flip] += (np.repeat(sizes, sizes) - 1 - 2 * local)[flip]
+        return PathSet(self.coords[vertex_index], offsets)
+
+    def select_vertices(self, keep: np.ndarray, min_size: int = 2) -> PathSet:
+        """Keep only the flagged vertices, splitting paths wherever vertices are dropped.
+
+        Every unbroken run of kept vertices becomes its own path; runs shorter
+        than ``min_size`` vertices are discarded.
+        """
+        keep = np.asarray(keep, dtype=bool)
+        if not keep.any():
+            return PathSet.empty()
+
+        # A new run starts at a kept vertex that begins its path or follows a dropped one.
+        begins = np.zeros(len(keep), dtype=bool)
+        begins[self.offsets[:-1][self.sizes > 0]] = True
+        begins[1:] |= ~keep[:-1]
+        run = np.cumsum(begins & keep)[keep] - 1
+        sizes = np.bincount(run)
+
+        coords = self.coords[keep]
+        long_enough = sizes >= min_size
+        if not long_enough.all():
+            coords = coords[np.repeat(long_enough, sizes)]
+            sizes = sizes[long_enough]
+        return PathSet(coords, _offsets_from_sizes(sizes))
+
+    def transform(self, scale=1.0, offset=(0.0, 0.0)) -> PathSet:
+        """Return a copy with every vertex mapped to ``coords * scale + offset``."""
+        scale = np.asarray(scale, dtype=COORD_DTYPE)
+        offset = np.asarray(offset, dtype=COORD_DTYPE)
+        return PathSet(self.coords * scale + offset, self.offsets)
+
+    def bounds(self) -> tuple[float, float, float, float]:
+        """Return ``(min_x, min_y, max_x, max_y)`` over all vertices."""
+        if not self.num_points:
+            return (0.0, 0.0, 0.0, 0.0)
+        lo = self.coords.min(axis=0)
+        hi = self.coords.max(axis=0)
+        return (float(lo[0]), float(lo[1]), float(hi[0]), float(hi[1]))
+
+
+def _offsets_from_sizes(sizes: np.ndarray) -> np.ndarray:
+    """Turn per-path vertex counts into an offsets array."""
+    offsets = np.zeros(len(sizes) + 1, dtype=OFFSET_DTYPE)
+    np.cumsum(sizes, out=offsets[1:])
+    return offsets
+
+
+def _ranges(starts: np.ndarray, sizes: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Concatenate ``arange(start, start + size)`` for every path without a loop.
+
+    ``offsets`` must be the offsets array built from ``sizes``.
+    """
+    total = int(offsets[-1])
+    shift = np.repeat(starts - offsets[:-1], sizes)
+    return np.arange(total, dtype=OFFSET_DTYPE) + shift
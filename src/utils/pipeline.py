@@ -0,0 +1,308 @@
+"""Memoised stages of the image processing pipeline.
+
+Each stage's output is cached under a key built from its upstream stage's
+key plus only the parameters that stage reads. Moving a slider therefore
+recomputes just the stages downstream of it: a new hatch angle reuses the
+filtered image, and a new brightness reuses the decoded upload.
+
+While a slider is being dragged the same stages run on a small proxy of
+the upload, and :data:`runs` lets a full-resolution run notice that a
+newer run has started so it can stop early.
+"""
+from __future__ import annotations
+
+import hashlib
+import itertools
+import logging
+import sys
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import cv2
+import numpy as np
+import plotly.graph_objects as go
+from PIL import Image
+
+from src.constants import PlotSettings
+from src.utils.cleanup import CleanupStats, clean_paths, cleanup_tolerance, needs_cleanup
+from src.utils.image_processing import adjust_tone, apply_filters, extract_paths, scale_to_plot
+from src.utils.image_store import image_store
+from src.utils.lru import ByteLRU
+from src.utils.ordering import OrderingStats, optimize_path_order, travel_distance
+from src.utils.paths import PathSet
+from src.utils.plotting import create_image_figure
+from src.utils.simplify import SimplifyStats, simplify_paths, stroke_tolerance
+
+logger = logging.getLogger(__name__)
+
+# Long edge, in pixels, of the proxy image processed while a slider is dragged.
+PROXY_SIZE = 512
+# Memory budget for stage outputs held by the default cache.
+STAGE_CACHE_BYTES = 256 * 1024 * 1024
+
+# Parameters each vectorization method actually reads, beyond the processed image.
+VECTORIZE_PARAMETERS = {
+    'contour': (),
+    'hatch': ('hatch_spacing', 'hatch_angle', 'hatch_link'),
+    'spiral': ('hatch_spacing',),
+    'concentric': ('hatch_spacing',),
+    'stipple': ('stipple_points',),
+}
+
+
+@dataclass
+class StageStats:
+    """Cache hits and misses for one pipeline stage."""
+    hits: int = 0
+    misses: int = 0
+
+
+def _nbytes(value: Any) -> int:
+    """Approximate memory held by a stage output."""
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(item) for item in value)
+    if isinstance(value, (np.ndarray, PathSet)):
+        return value.nbytes
+    if isinstance(value, Image.Image):
+        return value.width * value.height * len(value.getbands())
+    if isinstance(value, go.Figure):
+        # Preview figures are dominated by their encoded picture.
+        return sum(len(trace.source or '') for trace in value.data if isinstance(trace, go.Image))
+    return sys.getsizeof(value)
+
+
+class StageCache:
+    """LRU of stage outputs with per-stage hit and miss counters.
+
+    Outputs are kept until their total size exceeds ``max_bytes``, so many
+    small proxy results do not push out the few full-resolution ones.
+    """
+
+    def __init__(self, max_bytes: int = STAGE_CACHE_BYTES):
+        self.stats: dict[str, StageStats] = {}
+        self._entries: ByteLRU[str, Any] = ByteLRU(max_bytes, _nbytes)
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, stage: str, key: str, compute: Callable[[], Any]) -> Any:
+        """Return the cached output for ``key``, computing and storing it on a miss."""
+        value = self._entries.get(key)
+        with self._lock:
+            stats = self.stats.setdefault(stage, StageStats())
+            if value is not None:
+                stats.hits += 1
+                return value
+            stats.misses += 1
+        return self._entries.put(key, compute())
+
+    def peek(self, key: str) -> Any | None:
+        """Return the cached output for ``key`` without touching the counters, or ``None``."""
+        return self._entries.peek(key)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by cached outputs."""
+        return self._entries.nbytes
+
+    def clear(self) -> None:
+        """Drop every cached output and reset the counters."""
+        self._entries.clear()
+        with self._lock:
+            self.stats.clear()
+
+
+stage_cache = StageCache()
+
+
+def stage_key(stage: str, upstream: str, **params) -> str:
+    """Key for a stage's output from its upstream key and the parameters it reads."""
+    text = repr((stage, upstream, sorted(params.items())))
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def _run(stage: str, upstream: str, compute: Callable[[], Any], **params) -> tuple[str, Any]:
+    key = stage_key(stage, upstream, **params)
+    return key, stage_cache.get_or_compute(stage, key, compute)
+
+
+def _load(image_key: str) -> Image.Image:
+    img = image_store.get(image_key)
+    if img is None:
+        raise KeyError(f"Image {image_key} is no longer stored")
+    return img
+
+
+def _downsample(img: Image.Image, long_edge: int) -> tuple[Image.Image, float]:
+    factor = min(1.0, long_edge / max(img.size))
+    if factor < 1.0:
+        size = (max(round(img.width * factor), 1), max(round(img.height * factor), 1))
+        img = Image.fromarray(cv2.resize(np.asarray(img), size, interpolation=cv2.INTER_AREA))
+    return img, factor
+
+
+def source_image(image_key: str, proxy: bool = False) -> tuple[str, Callable[[], Image.Image], float]:
+    """Starting point of the pipeline as ``(key, load, pixel_scale)``.
+
+    For the full-resolution source ``load`` only touches the image store
+    when a downstream stage actually misses. With ``proxy`` set the upload
+    is downsampled to :data:`PROXY_SIZE` on its long edge, once per image,
+    and ``pixel_scale`` is the proxy's size relative to the original.
+    """
+    if not proxy:
+        return image_key, lambda: _load(image_key), 1.0
+    key, (img, factor) = _run(
+        'proxy', image_key, lambda: _downsample(_load(image_key), PROXY_SIZE), size=PROXY_SIZE,
+    )
+    return key, lambda: img, factor
+
+
+def filter_image(
+    source_key: str,
+    load: Callable[[], Image.Image],
+    brightness: int,
+    contrast: int,
+    threshold: int,
+    invert: bool,
+    edge_method: str,
+) -> tuple[str, Image.Image]:
+    """Filtered image for a pipeline source, as ``(key, image)``."""
+    return _run(
+        'filter', source_key,
+        lambda: apply_filters(load(), brightness, contrast, threshold, invert, edge_method),
+        brightness=brightness, contrast=contrast, threshold=threshold, invert=invert, edge_method=edge_method,
+    )
+
+
+def tone_image(
+    source_key: str,
+    load: Callable[[], Image.Image],
+    brightness: int,
+    contrast: int,
+    invert: bool,
+) -> tuple[str, Image.Image]:
+    """Grey-level image for a pipeline source, adjusted but not thresholded, as ``(key, image)``."""
+    return _run(
+        'tone', source_key,
+        lambda: adjust_tone(load(), brightness, contrast, invert),
+        brightness=brightness, contrast=contrast, invert=invert,
+    )
+
+
+def vectorize(
+    filter_key: str,
+    processed: Image.Image,
+    method: str,
+    plot_settings: PlotSettings,
+    pixel_scale: float = 1.0,
+    optimize: bool = True,
+    cleanup: bool = True,
+    tone: Callable[[], Image.Image] | None = None,
+    edge_method: str = 'none',
+    check: Callable[[], None] | None = None,
+    **params,
+) -> tuple[str, tuple[PathSet, OrderingStats, CleanupStats]]:
+    """Ordered plot paths for a filtered image, as ``(key, (paths, order_stats, cleanup_stats))``.
+
+    Only the parameters listed for ``method`` in :data:`VECTORIZE_PARAMETERS`
+    reach the key, so changing hatch settings does not invalidate contours.
+    Line spacing is in source pixels and is scaled by ``pixel_scale`` so a
+    proxy image gets the same spacing on paper, and the stipple count is
+    scaled with the proxy's area. Without ``optimize`` the paths keep their
+    extraction order, which is enough for a quick preview. With ``cleanup``
+    double strokes are dropped and touching fragments joined before
+    ordering, but only for contours traced with an edge filter
+    ``edge_method``, as fill spacing may be finer than the tolerance;
+    previews skip it too. Stippling reads its darkness from ``tone``, the
+    matching :func:`tone_image`, which is only loaded then; the filter key
+    already covers the settings it and ``edge_method`` depend on.
+
+    ``check``, e.g. a :meth:`RunTracker.check` bound to a run, is called
+    between sub-steps and inside cleanup and ordering; whatever it raises
+    aborts the stage without caching anything.
+    """
+    used = {name: params[name] for name in VECTORIZE_PARAMETERS.get(method, ())}
+    cleanup = cleanup and optimize and needs_cleanup(method, edge_method)
+    if 'hatch_spacing' in used:
+        used['hatch_spacing'] = max(used['hatch_spacing'] * pixel_scale, 1.0)
+    if 'stipple_points' in used:
+        used['stipple_points'] = max(int(used['stipple_points'] * pixel_scale ** 2), 1)
+
+    check = check or (lambda: None)
+
+    def compute():
+        grey = tone() if method == 'stipple' and tone is not None else None
+        paths = extract_paths(processed, method, tone=grey, **used)
+        check()
+        paths = scale_to_plot(paths, processed.size, plot_settings)
+        if not optimize:
+            travel = travel_distance(paths)
+            return paths, OrderingStats(travel, travel), CleanupStats(len(paths), len(paths), 0)
+        paths, cleanup_stats = clean_paths(paths, cleanup_tolerance(plot_settings) if cleanup else 0.0, check)
+        check()
+        return (*optimize_path_order(paths, check=check), cleanup_stats)
+
+    return _run(
+        'vectorize', filter_key, compute,
+        method=method, plot_settings=plot_settings, optimize=optimize, cleanup=cleanup, **used,
+    )
+
+
+def simplify(
+    paths_key: str,
+    paths: PathSet,
+    method: str,
+    plot_settings: PlotSettings,
+) -> tuple[str, tuple[PathSet, SimplifyStats]]:
+    """Simplified plot paths, as ``(key, (paths, stats))``.
+
+    The tolerance follows the stroke width, and path ends are kept, so the
+    pen-travel order found upstream still holds.
+    """
+    tolerance = stroke_tolerance(plot_settings)
+    return _run(
+        'simplify', paths_key, lambda: simplify_paths(paths, tolerance, method), method=method, tolerance=tolerance,
+    )
+
+
+def image_figure(upstream: str, title: str, load: Callable[[], Image.Image]):
+    """Preview figure for a stage's image, built once per key and title."""
+    return _run('figure', upstream, lambda: create_image_figure(load(), title), title=title)[1]
+
+
+class Superseded(Exception):
+    """Raised inside a run once a newer run for the same session has started."""
+
+
+class RunTracker:
+    """Hands out a ticket per run so a run can check whether it is still the newest for its session.
+
+    Runs are keyed on the browser session rather than the image, so two
+    tabs showing the same upload do not cancel each other.
+    """
+
+    def __init__(self):
+        self._latest: dict[str, int] = {}
+        self._tickets = itertools.count()
+        self._lock = threading.Lock()
+
+    def start(self, session_id: str) -> int:
+        """Register a new run for ``session_id``, superseding any in flight."""
+        with self._lock:
+            ticket = self._latest[session_id] = next(self._tickets)
+        return ticket
+
+    def check(self, session_id: str, ticket: int) -> None:
+        """Raise :class:`Superseded` if a newer run for ``session_id`` has started."""
+        if self._latest.get(session_id) != ticket:
+            raise Superseded(session_id)
+
+
+runs = RunTracker()
+
+
+def log_stats() -> None:
+    """Log the hit and miss counters of every stage."""
+    logger.debug(
+        "Pipeline cache: %s",
+        ", ".join(f"{stage} {s.hits} hit/{s.misses} miss" for stage, s in stage_cache.stats.items()),
+    )
@@ -1,29 +1,72 @@
 """Plotting utilities for the CNC Pen Plotter application."""
 from __future__ import annotations
 
+import base64
+import io
 import logging
 from datetime import datetime
-from typing import Iterable
-
+from typing import Iterator
+import cv2
 import numpy as np
 import plotly.graph_objects as go
+from PIL import Image
 
 from src.constants import PlotSettings
+from src.utils.arcs import ARC_MIN_PRECISION, LINE, ArcPaths
+from src.utils.paths import PathSet
 
 logger = logging.getLogger(__name__)
 
+# Long edge, in pixels, of image previews sent to the browser.
+PREVIEW_SIZE = 800
+
+# Toolpath previews keep about one vertex per pixel across this many pixels.
+TOOLPATH_SCREEN_PX = 1200
+# Upper bound on vertices sent for one toolpath preview.
+TOOLPATH_MAX_POINTS = 400_000
+
+# Vertices formatted per chunk of streamed G-code.
+GCODE_CHUNK_VERTICES = 50_000
+
+
+def encode_preview(img: Image.Image, max_size: int = PREVIEW_SIZE) -> tuple[str, float]:
+    """Downscale an image for display and encode it as a data URI.
+
+    Returns the URI and the scale from source pixels to preview pixels.
+    Images that are still two-level after scaling compress best as PNG;
+    anything else, including masks smoothed by downscaling, is sent as
+    lossy WebP.
+    """
+    pixels = np.asarray(img)
+    factor = min(1.0, max_size / max(img.size))
+    if factor < 1.0:
+        size = (max(round(img.width * factor), 1), max(round(img.height * factor), 1))
+        pixels = cv2.resize(pixels, size, interpolation=cv2.INTER_AREA)
+
+    buffer = io.BytesIO()
+    if np.isin(pixels, (0, 255)).all():
+        Image.fromarray(pixels).save(buffer, format='PNG')
+        mime = 'image/png'
+    else:
+        Image.fromarray(pixels).save(buffer, format='WEBP', quality=85)
+        mime = 'image/webp'
+    return f"data:{mime};base64,{base64.b64encode(buffer.getvalue()).decode()}", factor
+
 
 def create_image_figure(img, title: str) -> go.Figure:
-    """Create a Plotly figure from a PIL image."""
+    """Create a Plotly figure showing a PIL image as a compressed, display-sized picture.
+
+    Axes stay in source pixel units whatever the preview resolution.
+    """
     if img is None:
         fig = go.Figure()
     else:
-        img_array = np.array(img)
+        source, factor = encode_preview(img)
         fig = go.Figure(
-            data=go.Heatmap(
-                z=img_array,
-                colorscale='gray',
-                showscale=False,
+            data=go.Image(
+                source=source,
+                dx=1 / factor,
+                dy=1 / factor,
                 hoverinfo='skip',
             )
         )
@@ -40,6 +83,20 @@ def create_image_figure(img, title: str) -> go.Figure:
     return fig
 
 
+def rasterize_paths(paths: PathSet, plot_settings: PlotSettings, px_per_mm: float = 4.0) -> Image.Image:
+    """Render plot-millimetre paths as black strokes on white for previews."""
+    width = max(int(round(plot_settings.width * px_per_mm)), 1)
+    height = max(int(round(plot_settings.height * px_per_mm)), 1)
+    canvas = np.full((height, width), 255, dtype=np.uint8)
+    if len(paths):
+        # Draw with 4 bits of sub-pixel precision.
+        points = np.rint(paths.coords * (px_per_mm * 16)).astype(np.int32)
+        bounds = paths.offsets.tolist()
+        polylines = [points[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+        cv2.polylines(canvas, polylines, False, 0, 1, cv2.LINE_AA, shift=4)
+    return Image.fromarray(canvas, mode='L')
+
+
 def create_empty_figure() -> go.Figure:
     """Create an empty figure for initialization."""
     fig = go.Figure()
@@ -53,39 +110,301 @@ def create_empty_figure() -> go.Figure:
     return fig
 
 
-def generate_gcode(paths: Iterable[tuple[int, int]], plot_settings: PlotSettings) -> str:
-    """Generate G-code from vector paths."""
-    # Mock implementation
+def _visible(paths: PathSet, view: tuple[float, float, float, float]) -> PathSet:
+    """Keep only segments whose bounding box meets ``view``, splitting paths where others are dropped."""
+    x0, y0, x1, y1 = view
+    coords = paths.coords
+    lo = np.minimum(coords[:-1], coords[1:])
+    hi = np.maximum(coords[:-1], coords[1:])
+    seen = (hi[:, 0] >= x0) & (lo[:, 0] <= x1) & (hi[:, 1] >= y0) & (lo[:, 1] <= y1)
+    # The step from one path's last vertex to the next path's first is not a segment.
+    seen[paths.offsets[1:-1] - 1] = False
+    keep = np.zeros(paths.num_points, dtype=bool)
+    keep[:-1] |= seen
+    keep[1:] |= seen
+    return paths.select_vertices(keep)
+
+
+def _decimate(paths: PathSet, pixel: float) -> PathSet:
+    """Drop vertices that fall in the same screen pixel as the vertex before them.
+
+    Path endpoints are always kept, so every path still starts and ends
+    where the pen does.
+    """
+    cell = np.floor(paths.coords / pixel).astype(np.int64)
+    keep = np.ones(paths.num_points, dtype=bool)
+    keep[1:] = (cell[1:] != cell[:-1]).any(axis=1)
+    keep[paths.offsets[:-1]] = True
+    keep[paths.offsets[1:] - 1] = True
+    sizes = np.bincount(paths.path_ids()[keep], minlength=len(paths))
+    return PathSet.from_sizes(paths.coords[keep], sizes)
+
+
+def _thin(paths: PathSet, max_points: int) -> PathSet:
+    """Keep an even sample of whole paths holding at most ``max_points`` vertices."""
+    if paths.num_points <= max_points:
+        return paths
+    stride = -(-paths.num_points // max_points)
+    paths = paths.take(np.arange(0, len(paths), stride))
+    return paths.take(np.flatnonzero(np.cumsum(paths.sizes) <= max_points))
+
+
+def _nan_separated(paths: PathSet) -> tuple[np.ndarray, np.ndarray]:
+    """Flatten paths into x and y arrays with a NaN break after every path."""
+    out = np.full((paths.num_points + len(paths), 2), np.nan, dtype=np.float32)
+    out[np.arange(paths.num_points) + paths.path_ids()] = paths.coords
+    return out[:, 0], out[:, 1]
+
+
+def create_toolpath_figure(
+    paths: PathSet,
+    plot_settings: PlotSettings,
+    view: tuple[float, float, float, float] | None = None,
+    screen_px: int = TOOLPATH_SCREEN_PX,
+    max_points: int = TOOLPATH_MAX_POINTS,
+) -> go.Figure:
+    """Plot pen-down strokes and pen-up travel as WebGL line traces.
+
+    Each kind of move is one ``Scattergl`` trace with NaN breaks between
+    paths. Only what falls inside ``view`` (``x0, y0, x1, y1`` in mm, the
+    whole plot area by default) is drawn, decimated to one vertex per
+    screen pixel across ``screen_px``. Both traces together stay within
+    ``max_points`` vertices: pen-up moves shorter than a pixel are left
+    out and take at most half of them, and the strokes' pixel keeps
+    doubling up to the size of the view. Jobs with too many paths to fit
+    even then, since every path keeps both ends, show an even sample of
+    their paths.
+    """
+    if view is None:
+        view = (0.0, 0.0, float(plot_settings.width), float(plot_settings.height))
+    x0, y0, x1, y1 = view
+    extent = max(x1 - x0, y1 - y0)
+    pixel = extent / screen_px
+
+    # Pen-up moves run from the home position through every gap between paths.
+    travel = PathSet.empty()
+    if len(paths):
+        home = np.zeros((1, 2), dtype=paths.coords.dtype)
+        start = np.concatenate([home, paths.ends[:-1]])
+        seen = np.hypot(*(paths.starts - start).T) >= pixel
+        moves = np.stack([start[seen], paths.starts[seen]], axis=1)
+        travel = _visible(PathSet.from_sizes(moves.reshape(-1, 2), np.full(int(seen.sum()), 2)), view)
+        travel = _thin(travel, max_points // 2)
+
+    budget = max_points - travel.num_points
+    # Pad by a pixel so strokes leaving the window are not clipped short.
+    drawn = _visible(paths, (x0 - pixel, y0 - pixel, x1 + pixel, y1 + pixel)) if len(paths) else paths
+    if drawn.num_points:
+        decimated = _decimate(drawn, pixel)
+        while decimated.num_points > budget and pixel < extent:
+            pixel *= 2
+            decimated = _decimate(drawn, pixel)
+        drawn = _thin(decimated, budget)
+
+    down_x, down_y = _nan_separated(drawn)
+    up_x, up_y = _nan_separated(travel)
+    fig = go.Figure([
+        go.Scattergl(
+            x=up_x, y=up_y, mode='lines', name='Pen up',
+            line=dict(color='rgba(220, 50, 47, 0.45)', width=1), hoverinfo='skip',
+        ),
+        go.Scattergl(
+            x=down_x, y=down_y, mode='lines', name='Pen down',
+            line=dict(color='black', width=1), hoverinfo='skip',
+        ),
+    ])
+    fig.update_layout(
+        xaxis=dict(visible=False, range=[x0, x1], scaleanchor='y', scaleratio=1),
+        yaxis=dict(visible=False, range=[y1, y0]),
+        shapes=[dict(
+            type='rect', x0=0, y0=0, x1=plot_settings.width, y1=plot_settings.height,
+            line=dict(color='lightgrey', width=1),
+        )],
+        legend=dict(orientation='h', y=1.02, x=0),
+        margin=dict(l=0, r=0, t=30, b=0),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        # Keeps the user's zoom when the figure is refined after a relayout.
+        uirevision='toolpath',
+    )
+    logger.debug("Toolpath preview: %d of %d vertices drawn", drawn.num_points, paths.num_points)
+    return fig
+
+
+def view_from_relayout(relayout: dict | None) -> tuple[float, float, float, float] | None:
+    """Extract the zoomed ``(x0, y0, x1, y1)`` window from Plotly relayout data.
+
+    Returns ``None`` when the event does not change the axis ranges.
+    """
+    if not relayout:
+        return None
+    try:
+        xs = (relayout['xaxis.range[0]'], relayout['xaxis.range[1]'])
+        ys = (relayout['yaxis.range[0]'], relayout['yaxis.range[1]'])
+    except KeyError:
+        return None
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def _format_axis(values: np.ndarray, precision: int, compact: bool) -> list[str]:
+    """Format quantized coordinates, given in units of ``10**-precision`` mm."""
+    text = [f"{v:.{precision}f}" for v in (values / 10 ** precision).tolist()]
+    if compact and precision > 0:
+        text = [t.rstrip('0').rstrip('.') for t in text]
+    return text
+
+
+def generate_gcode(
+    paths: PathSet | ArcPaths,
+    plot_settings: PlotSettings,
+    compact: bool = False,
+    precision: int = 3,
+    relative: bool = False,
+    chunk_vertices: int = GCODE_CHUNK_VERTICES,
+) -> Iterator[str]:
+    """Yield G-code for vector paths given in plot millimetres, a chunk of whole lines at a time.
+
+    Coordinates are rounded to ``precision`` decimals. ``compact`` drops
+    comments, trailing zeros and the modal words a controller already
+    holds: the motion word of consecutive moves, the feed rate after its
+    first use and any axis whose value does not change. ``relative``
+    switches to incremental (G91) moves after homing; deltas are taken
+    between rounded positions, so rounding never accumulates.
+
+    Arc moves of an :class:`~src.utils.arcs.ArcPaths` are written as
+    ``G2``/``G3`` with the centre as ``I``/``J`` offsets from the arc's
+    start, using at least :data:`~src.utils.arcs.ARC_MIN_PRECISION` decimals.
+    """
     logger.debug("Generating G-code with settings: %s", plot_settings)
-    gcode = f"""; Generated by Pen Plotter UI
-G90 ; Absolute positioning
-G21 ; Units in mm
-G0 Z{plot_settings.pen_lift_height} ; Pen up
-G0 X0 Y0 ; Home
-G0 Z0 ; Pen down
-G1 X10 Y10 F{plot_settings.feed_rate}
-G1 X20 Y20 F{plot_settings.feed_rate}
-G0 Z{plot_settings.pen_lift_height} ; Pen up
-M30 ; End
-"""
-    return gcode
-
-
-def generate_svg(paths: Iterable[tuple[int, int]], plot_settings: PlotSettings) -> str:
-    """Generate SVG from vector paths."""
-    # Mock implementation
+    motion = centers = None
+    if isinstance(paths, ArcPaths):
+        motion, centers, paths = paths.motion, paths.centers, paths.paths
+        precision = max(precision, ARC_MIN_PRECISION)
+    lift = plot_settings.pen_lift_height
+    feed = plot_settings.feed_rate
+    # Comments are dropped in compact mode.
+    note = (lambda text: "") if compact else (lambda text: f" ; {text}")
+
+    header = [
+        "G90" + note("Absolute positioning"),
+        "G21" + note("Units in mm"),
+        f"G0 Z{lift}" + note("Pen up"),
+        "G0 X0 Y0" + note("Home"),
+    ]
+    if not compact:
+        header.insert(0, "; Generated by Pen Plotter UI")
+    if relative:
+        header.append("G91" + note("Relative positioning"))
+    yield "\n".join(header) + "\n"
+
+    down = f"Z{-lift if relative else 0}"
+    pen_down = f"G0 {down}" + note("Pen down")
+    pen_up = f"G0 Z{lift}" + note("Pen up")
+    feed_word = f" F{feed}"
+    pen = np.zeros((1, 2), dtype=np.int64)  # rounded pen position, starting from home
+    offsets = paths.offsets
+    start = 0
+    while start < len(paths):
+        # Whole paths up to roughly chunk_vertices vertices, but at least one path.
+        stop = int(np.searchsorted(offsets, offsets[start] + chunk_vertices, side='right')) - 1
+        stop = min(max(stop, start + 1), len(paths))
+        batch = paths[start:stop]
+        first = int(offsets[start])
+        start = stop
+        if not batch.num_points:
+            continue
+        if motion is None:
+            codes = np.full(batch.num_points, LINE, dtype=np.int8)
+        else:
+            codes = motion[first:first + batch.num_points]
+
+        # Every vertex is reached from the row before it: its own path's previous
+        # vertex while drawing, or the previous path's last vertex when travelling.
+        rounded = np.rint(batch.coords.astype(np.float64) * 10 ** precision).astype(np.int64)
+        delta = rounded - np.concatenate([pen, rounded[:-1]])
+        pen = rounded[-1:]
+        shown = delta if relative else rounded
+        xs = _format_axis(shown[:, 0], precision, compact)
+        ys = _format_axis(shown[:, 1], precision, compact)
+        if compact:
+            words = [
+                (f"X{x} Y{y}" if my else f"X{x}") if mx else (f"Y{y}" if my else "")
+                for x, y, mx, my in zip(xs, ys, (delta[:, 0] != 0).tolist(), (delta[:, 1] != 0).tolist())
+            ]
+        else:
+            words = [f"X{x} Y{y}" for x, y in zip(xs, ys)]
+
+        arcs = np.flatnonzero(codes > LINE)
+        if len(arcs):
+            # Arc vertices never start a path, so the arc's start is the row before.
+            ij = np.rint(centers[first + arcs] * 10 ** precision).astype(np.int64) - rounded[arcs - 1]
+            i_text = _format_axis(ij[:, 0], precision, compact)
+            j_text = _format_axis(ij[:, 1], precision, compact)
+            for k, i, j in zip(arcs.tolist(), i_text, j_text):
+                words[k] = f"{words[k]} I{i} J{j}"
+
+        draws = np.ones(batch.num_points, dtype=bool)
+        draws[batch.offsets[:-1]] = False
+        if compact:
+            # A motion word is only needed where the mode changes within a path,
+            # and the feed rate only on the first drawing move of the job.
+            shown_draws = np.flatnonzero(draws & ((delta != 0).any(axis=1) | (codes > LINE)))
+            mode = codes[shown_draws]
+            owner = batch.path_ids()[shown_draws]
+            switch = np.ones(len(shown_draws), dtype=bool)
+            switch[1:] = (mode[1:] != mode[:-1]) | (owner[1:] != owner[:-1])
+            for k, code in zip(shown_draws[switch].tolist(), mode[switch].tolist()):
+                words[k] = f"G{code} {words[k]}"
+            if feed_word and len(shown_draws):
+                words[shown_draws[0]] += feed_word
+                feed_word = ""
+        else:
+            modes = codes.tolist()
+
+        lines = []
+        bounds = batch.offsets.tolist()
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            if a == b:
+                continue
+            if compact:
+                # The pen-down move stays in G0, so it needs no motion word of its own.
+                lines.extend((f"G0 {words[a]}", down) if words[a] else (pen_down,))
+                lines.extend(w for w in words[a + 1:b] if w)
+            else:
+                lines.append(f"G0 {words[a]}")
+                lines.append(pen_down)
+                lines.extend(f"G{m} {w}{feed_word}" for w, m in zip(words[a + 1:b], modes[a + 1:b]))
+            lines.append(pen_up)
+        yield "\n".join(lines) + "\n"
+
+    footer = ["M30" + note("End")]
+    if relative:
+        footer.insert(0, "G90" + note("Absolute positioning"))
+    yield "\n".join(footer) + "\n"
+
+
+def generate_svg(paths: PathSet, plot_settings: PlotSettings) -> str:
+    """Generate SVG from vector paths given in plot millimetres."""
     width = plot_settings.width
     height = plot_settings.height
-    svg = f'''<svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg">
-  <path d="M 10 10 L 90 90" stroke="black" fill="none"/>
-  <path d="M 90 10 L 10 90" stroke="black" fill="none"/>
+    elements = []
+    for path in paths:
+        points = " ".join(f"{x:.3f} {y:.3f}" for x, y in path.tolist())
+        elements.append(f'  <path d="M {points}" stroke="black" fill="none"/>')
+    body = "\n".join(elements)
+    svg = f'''<svg width="{width}mm" height="{height}mm" viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg">
+{body}
 </svg>'''
     return svg
 
 
+def download_filename(file_type: str) -> str:
+    """Timestamped file name for a download."""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f"plot_{timestamp}.{file_type}"
+
+
 def create_download_data(content: str, file_type: str) -> dict:
     """Create download data with timestamp."""
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"plot_{timestamp}.{file_type}"
-    return {"content": content, "filename": filename}
+    return {"content": content, "filename": download_filename(file_type)}
 
@@ -0,0 +1,155 @@
+"""Polyline simplification for the CNC Pen Plotter application.
+
+Both methods work on every path of a :class:`PathSet` at once, in rounds
+of array operations, and always keep the first and last vertex of each
+path so pen-travel ordering is unaffected.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.constants import PlotSettings
+from src.utils.paths import PathSet, _offsets_from_sizes, _ranges
+
+logger = logging.getLogger(__name__)
+
+# Default tolerance as a fraction of the stroke width; finer detail is lost under the pen anyway.
+SIMPLIFY_STROKE_FRACTION = 0.2
+
+
+@dataclass
+class SimplifyStats:
+    """Vertex counts before and after simplification."""
+    vertices_before: int
+    vertices_after: int
+
+    @property
+    def ratio(self) -> float:
+        """How many times fewer vertices the simplified paths have."""
+        return self.vertices_before / max(self.vertices_after, 1)
+
+
+def stroke_tolerance(plot_settings: PlotSettings) -> float:
+    """Default simplification tolerance, in mm, for a plot's stroke width."""
+    return plot_settings.stroke_width * SIMPLIFY_STROKE_FRACTION
+
+
+def _endpoints(paths: PathSet) -> np.ndarray:
+    keep = np.zeros(paths.num_points, dtype=bool)
+    nonempty = paths.sizes > 0
+    keep[paths.offsets[:-1][nonempty]] = True
+    keep[paths.offsets[1:][nonempty] - 1] = True
+    return keep
+
+
+def _segment_distance(points: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Distance from each point to the segment from the matching row of ``a`` to that of ``b``."""
+    ab, ap = b - a, points - a
+    length = (ab * ab).sum(axis=1)
+    t = np.clip((ap * ab).sum(axis=1) / np.where(length > 0, length, 1.0), 0.0, 1.0)
+    return np.hypot(*(ap - t[:, None] * ab).T)
+
+
+def _rdp_keep(paths: PathSet, tolerance: float) -> np.ndarray:
+    """Ramer-Douglas-Peucker, splitting every open span of every path in the same round."""
+    coords = paths.coords.astype(np.float64)
+    keep = _endpoints(paths)
+    long = paths.sizes > 2
+    lo, hi = paths.offsets[:-1][long], paths.offsets[1:][long] - 1
+
+    while len(lo):
+        sizes = hi - lo - 1
+        offsets = _offsets_from_sizes(sizes)
+        index = _ranges(lo + 1, sizes, offsets)
+        span = np.repeat(np.arange(len(lo)), sizes)
+
+        # Distance to the chord as a segment, so closed paths measure from their start.
+        distance = _segment_distance(coords[index], coords[lo][span], coords[hi][span])
+
+        # First farthest vertex of each span, without sorting.
+        farthest = np.maximum.reduceat(distance, offsets[:-1])
+        hits = np.flatnonzero(distance == farthest[span])
+        hits = hits[np.r_[True, span[hits[1:]] != span[hits[:-1]]]]
+        split = farthest > tolerance
+        at = index[hits][split]
+        keep[at] = True
+        lo, hi = np.concatenate([lo[split], at]), np.concatenate([at, hi[split]])
+        open_spans = hi - lo > 1
+        lo, hi = lo[open_spans], hi[open_spans]
+    return keep
+
+
+def _visvalingam_keep(paths: PathSet, tolerance: float) -> np.ndarray:
+    """Visvalingam-Whyatt, dropping every vertex whose triangle is a local minimum each round.
+
+    Vertices go while the triangle they form with their neighbours has less
+    area than ``tolerance ** 2`` and they sit within ``tolerance`` of their
+    neighbours' chord. Removing only local minima means no two
+    neighbours go in one round, so every removal sees up-to-date areas.
+    Unlike RDP the error is not strictly bounded, as each vertex is only
+    measured against the neighbours it has when it goes.
+    """
+    coords = paths.coords.astype(np.float64)
+    owner = paths.path_ids()
+    alive = np.ones(paths.num_points, dtype=bool)
+    limit = tolerance ** 2
+    while True:
+        index = np.flatnonzero(alive)
+        if len(index) < 3:
+            break
+        p, o = coords[index], owner[index]
+        interior = np.zeros(len(index), dtype=bool)
+        interior[1:-1] = (o[1:-1] == o[:-2]) & (o[1:-1] == o[2:])
+
+        area = np.full(len(index), np.inf)
+        u, v = p[:-2] - p[1:-1], p[2:] - p[1:-1]
+        area[1:-1] = np.where(interior[1:-1], np.abs(u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]) / 2, np.inf)
+        # Thin spikes have little area but stick far out, so the vertex must
+        # also lie within tolerance of its neighbours' chord.
+        distance = np.full(len(index), np.inf)
+        distance[1:-1] = _segment_distance(p[1:-1], p[:-2], p[2:])
+        small = (area < limit) & (distance <= tolerance)
+        if not small.any():
+            break
+        area[~small] = np.inf
+
+        # Ties, such as a straight run of zero-area vertices, are broken by a
+        # scrambled index so a run loses about a third of its vertices per round.
+        tie = (index * 2654435761) & 0xFFFFFFFF
+        below_left = np.ones(len(index), dtype=bool)
+        below_left[1:] = (area[1:] < area[:-1]) | ((area[1:] == area[:-1]) & (tie[1:] < tie[:-1]))
+        below_right = np.ones(len(index), dtype=bool)
+        below_right[:-1] = (area[:-1] < area[1:]) | ((area[:-1] == area[1:]) & (tie[:-1] < tie[1:]))
+        alive[index[small & below_left & below_right]] = False
+    return alive
+
+
+_METHODS = {
+    'rdp': _rdp_keep,
+    'visvalingam': _visvalingam_keep,
+}
+
+
+def simplify_paths(paths: PathSet, tolerance: float, method: str = 'rdp') -> tuple[PathSet, SimplifyStats]:
+    """Drop vertices that move the drawing by less than ``tolerance`` mm.
+
+    ``method`` is ``'rdp'`` (Ramer-Douglas-Peucker), ``'visvalingam'``
+    (Visvalingam-Whyatt) or ``'none'``.
+    """
+    if method == 'none' or tolerance <= 0 or not paths.num_points:
+        return paths, SimplifyStats(paths.num_points, paths.num_points)
+    if method not in _METHODS:
+        raise ValueError(f"Unknown simplification method: {method}")
+
+    keep = _METHODS[method](paths, tolerance)
+    sizes = np.bincount(paths.path_ids()[keep], minlength=len(paths))
+    simplified = PathSet(paths.coords[keep], _offsets_from_sizes(sizes))
+    stats = SimplifyStats(paths.num_points, simplified.num_points)
+    logger.debug(
+        "Simplified %d paths with %s: %d -> %d vertices",
+        len(paths), method, stats.vertices_before, stats.vertices_after,
+    )
+    return simplified, stats
@@ -0,0 +1,115 @@
+"""Weighted Voronoi stippling for the CNC Pen Plotter application."""
+from __future__ import annotations
+
+import logging
+
+import cv2
+import numpy as np
+
+from src.utils.ordering import optimize_path_order
+from src.utils.paths import PathSet
+
+logger = logging.getLogger(__name__)
+
+# Density grid resolution, in cells per stipple point, used for relaxation.
+CELLS_PER_POINT = 64
+
+
+def _density_grid(darkness: np.ndarray, num_points: int) -> tuple[np.ndarray, float]:
+    """Downsample the darkness map so relaxation cost scales with the point count."""
+    h, w = darkness.shape
+    factor = min(1.0, np.sqrt(num_points * CELLS_PER_POINT / (h * w)))
+    if factor < 1.0:
+        size = (max(int(w * factor), 1), max(int(h * factor), 1))
+        darkness = cv2.resize(darkness, size, interpolation=cv2.INTER_AREA)
+    return darkness, w / darkness.shape[1]
+
+
+def _nearest_point_labels(points: np.ndarray, shape: tuple[int, int]) -> np.ndarray:
+    """Label every grid cell with the index of its nearest point, or -1 if unclaimed."""
+    h, w = shape
+    cells = np.clip(points.astype(np.int64), 0, [w - 1, h - 1])
+    seeds = np.ones(shape, dtype=np.uint8)
+    seeds[cells[:, 1], cells[:, 0]] = 0
+    _, labels = cv2.distanceTransformWithLabels(seeds, cv2.DIST_L2, 5, labelType=cv2.DIST_LABEL_PIXEL)
+
+    # Seed pixels get labels 1..k in scan order; map them back to point indices.
+    lookup = np.full(labels.max() + 1, -1, dtype=np.int64)
+    lookup[labels[cells[:, 1], cells[:, 0]]] = np.arange(len(points))
+    return lookup[labels]
+
+
+def _separate_coincident(points: np.ndarray, shape: tuple[int, int], rng: np.random.Generator) -> None:
+    """Jitter, in place, every point sharing a grid cell with an earlier one.
+
+    Only one seed per cell gets a label, so a point hidden behind another
+    would otherwise claim no cell and never move.
+    """
+    h, w = shape
+    cells = np.clip(points.astype(np.int64), 0, [w - 1, h - 1])
+    _, first = np.unique(cells[:, 1] * w + cells[:, 0], return_index=True)
+    hidden = np.ones(len(points), dtype=bool)
+    hidden[first] = False
+    if hidden.any():
+        points[hidden] += rng.uniform(-1.0, 1.0, (int(hidden.sum()), 2))
+        np.clip(points, 0.0, [w - 1e-6, h - 1e-6], out=points)
+
+
+def _lloyd_relax(points: np.ndarray, grid: np.ndarray, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Move ``points`` to the weighted centroids of their Voronoi cells on ``grid``, ``iterations`` times."""
+    h, w = grid.shape
+    weights = grid.ravel().astype(np.float64)
+    gx = np.tile(np.arange(w, dtype=np.float64) + 0.5, h)
+    gy = np.repeat(np.arange(h, dtype=np.float64) + 0.5, w)
+    for _ in range(iterations):
+        _separate_coincident(points, (h, w), rng)
+        labels = _nearest_point_labels(points, (h, w)).ravel()
+        claimed = labels >= 0
+        mass = np.bincount(labels[claimed], weights=weights[claimed], minlength=len(points))
+        cx = np.bincount(labels[claimed], weights=(weights * gx)[claimed], minlength=len(points))
+        cy = np.bincount(labels[claimed], weights=(weights * gy)[claimed], minlength=len(points))
+        # Points whose cell holds no ink stay put rather than collapsing to the origin.
+        moved = mass > 0
+        points[moved, 0] = cx[moved] / mass[moved]
+        points[moved, 1] = cy[moved] / mass[moved]
+    return points
+
+
+def weighted_voronoi_stipple(
+    darkness: np.ndarray,
+    num_points: int,
+    iterations: int = 20,
+    seed: int = 0,
+) -> np.ndarray:
+    """Place ``num_points`` stipples by Lloyd relaxation weighted by ``darkness``.
+
+    ``darkness`` is a float array in ``[0, 1]``. Each iteration labels the
+    density grid with a distance transform and moves every point to the
+    weighted centroid of its Voronoi cell; points sharing a grid cell are
+    jittered apart first. Returns ``(num_points, 2)`` pixel coordinates.
+    """
+    grid, cell_size = _density_grid(darkness.astype(np.float32), num_points)
+    h, w = grid.shape
+    weights = grid.ravel().astype(np.float64)
+    total = weights.sum()
+    if total <= 0 or num_points <= 0:
+        return np.empty((0, 2), dtype=np.float32)
+
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(weights), size=num_points, p=weights / total)
+    ys, xs = np.divmod(picks, w)
+    points = np.stack([xs, ys], axis=1) + rng.random((num_points, 2))
+    points = _lloyd_relax(points, grid, iterations, rng)
+    return (points * cell_size).astype(np.float32)
+
+
+def stipple_tour(darkness: np.ndarray, num_points: int, iterations: int = 20, seed: int = 0) -> PathSet:
+    """Stipple the darkness map and join the dots into one continuous tour."""
+    points = weighted_voronoi_stipple(darkness, num_points, iterations, seed)
+    if not len(points):
+        return PathSet.empty()
+
+    dots = PathSet.from_sizes(points, np.ones(len(points), dtype=np.int64))
+    tour, stats = optimize_path_order(dots, origin=points.min(axis=0))
+    logger.debug("Stippled %d points, tour length %.1f px", len(points), stats.travel_after)
+    return PathSet.from_sizes(tour.coords, [tour.num_points])
@@ -0,0 +1,113 @@
+"""Parallel seed sweeps for the generative art page.
+
+Each variant of an algorithm is generated, reordered for pen travel and
+thumbnailed in a worker process. Results are kept in an in-memory LRU keyed
+by the variant, so promoting a thumbnail to the main preview, or sweeping
+the same seeds again, is served without regenerating anything.
+"""
+from __future__ import annotations
+
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import cv2
+
+from src.constants import DEFAULT_PLOT_SETTINGS
+from src.utils.generative_art import generate_paths
+from src.utils.lru import ByteLRU
+from src.utils.ordering import OrderingStats, optimize_path_order
+from src.utils.paths import PathSet
+from src.utils.plotting import rasterize_paths
+
+logger = logging.getLogger(__name__)
+
+# Long side of a sweep thumbnail, in pixels.
+THUMBNAIL_SIZE = 160
+
+# Upper bound on the path data held by the variant cache.
+CACHE_BYTES = 256 * 1024 * 1024
+
+SWEEP_WORKERS = os.cpu_count() or 1
+
+
+@dataclass(frozen=True)
+class Variant:
+    """One point in the sweep, and the key its result is cached under."""
+    algorithm: str
+    seed: int
+    complexity: int
+    scale: float
+
+
+@dataclass
+class VariantResult:
+    """Ordered paths for a variant, with their travel stats and a PNG thumbnail."""
+    paths: PathSet
+    order_stats: OrderingStats
+    thumbnail: bytes
+
+
+def _render_variant(variant: Variant) -> VariantResult:
+    """Generate, reorder and thumbnail one variant."""
+    paths = generate_paths(
+        variant.algorithm, variant.complexity, variant.scale, DEFAULT_PLOT_SETTINGS, seed=variant.seed,
+    )
+    paths, order_stats = optimize_path_order(paths)
+
+    long_side = max(DEFAULT_PLOT_SETTINGS.width, DEFAULT_PLOT_SETTINGS.height)
+    image = rasterize_paths(paths, DEFAULT_PLOT_SETTINGS, px_per_mm=THUMBNAIL_SIZE / long_side)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return VariantResult(paths, order_stats, buffer.getvalue())
+
+
+def _init_worker() -> None:
+    # One OpenCV thread per process, or a full pool oversubscribes every core.
+    cv2.setNumThreads(1)
+
+
+_cache: ByteLRU[Variant, VariantResult] = ByteLRU(CACHE_BYTES, lambda result: result.paths.nbytes)
+_lock = threading.Lock()
+_pool: ProcessPoolExecutor | None = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            # Spawned rather than forked workers, so no OpenCV or server threads are inherited.
+            _pool = ProcessPoolExecutor(
+                max_workers=SWEEP_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def render_variant(variant: Variant) -> VariantResult:
+    """Return the result for one variant, generating it in this process on a cache miss."""
+    result = _cache.get(variant)
+    if result is None:
+        result = _render_variant(variant)
+        _cache.put(variant, result)
+    return result
+
+
+def sweep_variants(variants: list[Variant]) -> list[VariantResult]:
+    """Return results for all variants, generating the uncached ones across the worker pool."""
+    results = {variant: _cache.get(variant) for variant in variants}
+    missing = [variant for variant, result in results.items() if result is None]
+    if len(missing) == 1:
+        results[missing[0]] = render_variant(missing[0])
+    elif missing:
+        for variant, result in zip(missing, _get_pool().map(_render_variant, missing)):
+            _cache.put(variant, result)
+            results[variant] = result
+
+    logger.debug("Swept %d variants, %d generated", len(variants), len(missing))
+    return [results[variant] for variant in variants]
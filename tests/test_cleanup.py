@@ -0,0 +1,93 @@
+"""Tests for fragment joining and double-stroke removal."""
+from dataclasses import replace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.constants import DEFAULT_PLOT_SETTINGS
+from src.utils import cleanup, pipeline
+from src.utils.cleanup import clean_paths, needs_cleanup
+from src.utils.image_processing import apply_filters
+from src.utils.paths import PathSet
+from src.utils.simplify import _segment_distance
+
+
+def _disk(size: int = 160) -> Image.Image:
+    """Dark disk fading out towards its rim on a white background."""
+    y, x = np.mgrid[:size, :size]
+    radius = np.hypot(x - size / 2, y - size / 2) / (size / 2.5)
+    return Image.fromarray((np.clip(radius, 0, 1) * 255).astype(np.uint8), mode='L')
+
+
+@pytest.mark.parametrize('method', ['hatch', 'spiral', 'stipple'])
+def test_fills_come_through_cleanup_unchanged(method):
+    img = _disk()
+    processed = apply_filters(img, 0, 0, 200, False, 'none')
+    # Lines a pixel apart on a small plot lie closer than the cleanup tolerance.
+    plot_settings = replace(DEFAULT_PLOT_SETTINGS, width=20, height=20)
+    assert plot_settings.width / img.width < cleanup.cleanup_tolerance(plot_settings)
+    params = dict(hatch_spacing=1, hatch_angle=30, hatch_link=True, stipple_points=2000)
+    runs = {}
+    for cleanup_on in (True, False):
+        _, runs[cleanup_on] = pipeline.vectorize(
+            f'test-fill-{cleanup_on}', processed, method, plot_settings,
+            cleanup=cleanup_on, tone=lambda: img, **params,
+        )
+    (cleaned, _, stats), (plain, _, _) = runs[True], runs[False]
+    assert stats.segments_removed == 0
+    assert stats.paths_before == stats.paths_after == len(plain)
+    assert np.array_equal(cleaned.offsets, plain.offsets)
+    assert np.array_equal(cleaned.coords, plain.coords)
+
+
+def test_only_edge_traced_contours_are_cleaned():
+    assert all(needs_cleanup('contour', edge) for edge in ('canny', 'sobel', 'laplacian'))
+    assert not needs_cleanup('contour', 'none')
+    assert not any(needs_cleanup(method, 'canny') for method in ('hatch', 'spiral', 'concentric', 'stipple'))
+
+
+def test_retraced_stroke_is_drawn_once():
+    paths = PathSet.from_polylines([np.array([[0, 0], [1, 1], [2, 0], [1, 1], [0, 0]], dtype=float)])
+    cleaned, stats = clean_paths(paths, 0.1)
+    assert stats.segments_removed == 2
+    assert cleaned[0].tolist() == [[0, 0], [1, 1], [2, 0]]
+
+
+def test_stair_steps_are_merged_within_tolerance():
+    steps = np.repeat(np.arange(200) * 0.05, 2)
+    stairs = np.c_[steps[1:], steps[:-1]]
+    cleaned, _ = clean_paths(PathSet.from_polylines([stairs]), 0.25)
+    merged = cleaned[0]
+    assert len(merged) < 10
+    assert np.allclose(merged[[0, -1]], stairs[[0, -1]])
+    distance = np.min([
+        _segment_distance(stairs, np.broadcast_to(a, stairs.shape), np.broadcast_to(b, stairs.shape))
+        for a, b in zip(merged[:-1], merged[1:])
+    ], axis=0)
+    assert distance.max() <= 0.25 * cleanup.CLEANUP_MERGE_FRACTION + 1e-6
+
+
+def test_fragments_are_joined_into_one_path():
+    t = np.linspace(0, 2 * np.pi, 101)
+    circle = np.c_[np.cos(t), np.sin(t)] * 10
+    fragments = [circle[i * 20:(i + 1) * 20 + 1] for i in range(5)]
+    fragments[1] = fragments[1][::-1]
+    cleaned, stats = clean_paths(PathSet.from_polylines(fragments), 0.1)
+    assert (stats.paths_before, stats.paths_after) == (5, 1)
+    assert np.allclose(cleaned[0][0], cleaned[0][-1], atol=1e-4)
+    assert np.allclose(np.hypot(*cleaned[0].T), 10, atol=1e-4)
+
+
+def test_small_pair_chunks_give_the_same_result(monkeypatch):
+    rng = np.random.default_rng(0)
+    strokes = [np.cumsum(rng.normal(0, 0.3, (8, 2)), axis=0) + rng.uniform(0, 10, 2) for _ in range(200)]
+    strokes += [s[::-1] + rng.normal(0, 0.02, s.shape) for s in strokes[::3]]
+    paths = PathSet.from_polylines(strokes)
+    expected, expected_stats = clean_paths(paths, 0.2)
+
+    monkeypatch.setattr(cleanup, '_PAIR_CHUNK', 64)
+    chunked, chunked_stats = clean_paths(paths, 0.2)
+    assert chunked_stats == expected_stats
+    assert np.array_equal(chunked.offsets, expected.offsets)
+    assert np.array_equal(chunked.coords, expected.coords)
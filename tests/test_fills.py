@@ -0,0 +1,32 @@
+"""Tests for the region fill engines."""
+import cv2
+import numpy as np
+import pytest
+
+from src.utils.fills import hatch_fill
+
+
+def _ring(inner: int = 0, size: int = 700, outer: int = 300) -> np.ndarray:
+    mask = np.zeros((size, size), dtype=np.uint8)
+    cv2.circle(mask, (size // 2, size // 2), outer, 1, -1)
+    if inner:
+        cv2.circle(mask, (size // 2, size // 2), inner, 0, -1)
+    return mask
+
+
+@pytest.mark.parametrize('angle', [0, 30, 45, 90])
+def test_linked_hatch_draws_a_disc_in_few_strokes(angle):
+    mask = _ring()
+    segments = len(hatch_fill(mask, 5, angle))
+    strokes = len(hatch_fill(mask, 5, angle, link=True))
+    assert segments > 100
+    assert strokes * 20 <= segments
+
+
+def test_linked_hatch_never_crosses_a_hole():
+    mask = _ring(inner=150)
+    paths = hatch_fill(mask, 5, 30, link=True)
+    t = np.linspace(0, 1, 50)[:, None, None]
+    for path in paths:
+        points = path[:-1] + t * (path[1:] - path[:-1])
+        assert np.hypot(*(points.reshape(-1, 2) - 350).T).min() > 148.5
@@ -0,0 +1,32 @@
+"""Tests for image vectorization."""
+import numpy as np
+from PIL import Image
+
+from src.utils.image_processing import adjust_tone, apply_filters, extract_paths
+
+
+def _gradient(width: int = 240, height: int = 120) -> Image.Image:
+    """Black on the left fading to white on the right."""
+    row = np.linspace(0, 255, width).astype(np.uint8)
+    return Image.fromarray(np.tile(row, (height, 1)), mode='L')
+
+
+def test_stipple_density_follows_gradient():
+    img = _gradient()
+    processed = apply_filters(img, 0, 0, 128, False, 'none')
+    tone = adjust_tone(img, 0, 0, False)
+    paths = extract_paths(processed, 'stipple', stipple_points=2000, tone=tone)
+
+    counts, _ = np.histogram(paths.coords[:, 0], bins=4, range=(0, img.width))
+    assert counts.sum() == 2000
+    assert np.all(np.diff(counts) < 0), counts
+    assert counts[0] > 2 * counts[2], counts
+
+
+def test_stipple_falls_back_to_processed_image():
+    img = _gradient()
+    processed = apply_filters(img, 0, 0, 128, False, 'none')
+    paths = extract_paths(processed, 'stipple', stipple_points=500)
+
+    # The thresholded image has no ink on its light half.
+    assert paths.coords[:, 0].max() < img.width / 2 + 2
@@ -0,0 +1,64 @@
+"""Tests for the shared byte-bounded LRU and the stores built on it."""
+import io
+
+import numpy as np
+from PIL import Image
+
+from src.utils.image_store import ImageStore
+from src.utils.jobs import JobStore
+from src.utils.lru import ByteLRU
+from src.utils.paths import PathSet
+
+
+def test_evicts_least_recent_and_reports_it():
+    evicted = []
+    cache = ByteLRU(3, len, lambda key, value: evicted.append(key))
+    for key in 'abc':
+        cache.put(key, 'x')
+    cache.get('a')
+    cache.put('d', 'x')
+    assert evicted == ['b']
+    assert 'a' in cache and 'b' not in cache
+    assert cache.nbytes == 3
+
+
+def test_keeps_newest_entry_over_budget():
+    cache = ByteLRU(3, len)
+    cache.put('a', 'x')
+    cache.put('b', 'xxxxx')
+    assert len(cache) == 1
+    assert cache.peek('b') == 'xxxxx'
+
+
+def test_put_again_remeasures_the_entry():
+    cache = ByteLRU(10, len)
+    value = ['x']
+    cache.put('a', value)
+    value.extend('xxx')
+    cache.put('a', value)
+    assert cache.nbytes == 4
+
+
+def test_job_store_counts_and_drops_arc_fits_with_their_job():
+    t = np.linspace(0, 2 * np.pi, 200)
+    paths = PathSet.from_polylines([np.c_[np.cos(t), np.sin(t)] * 10])
+    store = JobStore(max_bytes=paths.nbytes * 3)
+    key = store.put(paths)
+    fitted, _ = store.arcs(key, 0.05)
+    assert store._jobs.nbytes == paths.nbytes + fitted.nbytes
+    store.put(PathSet.from_polylines([np.zeros((400, 2))]), 'other')
+    assert store.get(key) is None
+    assert store._jobs.nbytes == store.get('other').nbytes
+
+
+def test_image_store_spills_evicted_images(tmp_path):
+    def encoded(shade):
+        buffer = io.BytesIO()
+        Image.new('L', (64, 64), shade).save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    store = ImageStore(max_bytes=64 * 64, spill_dir=str(tmp_path))
+    first = store.put(encoded(10))
+    store.put(encoded(200))
+    assert store.nbytes == 64 * 64
+    assert np.asarray(store.get(first)).max() == 10
@@ -0,0 +1,61 @@
+"""Tests for the memoised pipeline stages."""
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.constants import DEFAULT_PLOT_SETTINGS
+from src.utils import pipeline
+from src.utils.pipeline import RunTracker, StageCache, Superseded
+
+
+def test_stage_cache_keeps_large_entries_through_many_small_ones():
+    cache = StageCache(max_bytes=2 * 1024 * 1024)
+    full = np.zeros(1024 * 1024, dtype=np.uint8)
+    cache.get_or_compute('vectorize', 'full', lambda: full)
+    for tick in range(200):
+        cache.get_or_compute('vectorize', f'proxy-{tick}', lambda: np.zeros(1024, dtype=np.uint8))
+    assert cache.peek('full') is full
+
+
+def test_stage_cache_evicts_least_recent_over_budget():
+    cache = StageCache(max_bytes=3000)
+    for name in 'abc':
+        cache.get_or_compute('filter', name, lambda: np.zeros(1000, dtype=np.uint8))
+    cache.get_or_compute('filter', 'a', lambda: None)
+    cache.get_or_compute('filter', 'd', lambda: np.zeros(1000, dtype=np.uint8))
+    assert cache.peek('b') is None
+    assert cache.peek('a') is not None
+    assert cache.nbytes <= 3000
+
+
+def test_runs_in_other_sessions_do_not_supersede_each_other():
+    runs = RunTracker()
+    first = runs.start('tab-a')
+    runs.start('tab-b')
+    runs.check('tab-a', first)
+    runs.start('tab-a')
+    with pytest.raises(Superseded):
+        runs.check('tab-a', first)
+
+
+def test_superseded_run_stops_inside_vectorize_and_caches_nothing():
+    y, x = np.mgrid[:200, :200]
+    edges = Image.fromarray(((x // 8 + y // 8) % 2 * 255).astype(np.uint8), mode='L')
+    runs = RunTracker()
+    ticket = runs.start('tab')
+    calls = []
+
+    def check():
+        calls.append(len(calls))
+        # A newer run starts while this one is ordering its paths.
+        if len(calls) == 3:
+            runs.start('tab')
+        runs.check('tab', ticket)
+
+    with pytest.raises(Superseded):
+        pipeline.vectorize('test-superseded', edges, 'contour', DEFAULT_PLOT_SETTINGS, check=check)
+    assert len(calls) == 3
+    assert pipeline.stage_cache.peek(
+        pipeline.stage_key('vectorize', 'test-superseded', method='contour', plot_settings=DEFAULT_PLOT_SETTINGS,
+                           optimize=True, cleanup=False),
+    ) is None
@@ -0,0 +1,29 @@
+"""Tests for the toolpath preview."""
+import numpy as np
+
+from src.constants import DEFAULT_PLOT_SETTINGS
+from src.utils.paths import PathSet
+from src.utils.plotting import create_toolpath_figure
+
+
+def _vertices(trace) -> int:
+    return int(np.count_nonzero(~np.isnan(np.asarray(trace.x, dtype=float))))
+
+
+def test_preview_of_many_short_paths_stays_within_max_points():
+    rng = np.random.default_rng(0)
+    starts = rng.uniform(0, 100, (5000, 2))
+    coords = np.stack([starts, starts + 0.5], axis=1).reshape(-1, 2)
+    paths = PathSet.from_sizes(coords.astype(np.float32), np.full(5000, 2))
+
+    fig = create_toolpath_figure(paths, DEFAULT_PLOT_SETTINGS, max_points=2000)
+    up, down = fig.data
+    assert 0 < _vertices(down)
+    assert _vertices(up) + _vertices(down) <= 2000
+
+
+def test_preview_of_a_small_job_is_complete():
+    paths = PathSet.from_polylines([np.array([[10, 10], [50, 10], [50, 50]]), np.array([[100, 100], [150, 120]])])
+    up, down = create_toolpath_figure(paths, DEFAULT_PLOT_SETTINGS).data
+    assert _vertices(down) == 5
+    assert _vertices(up) == 4
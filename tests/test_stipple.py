@@ -0,0 +1,17 @@
+"""Tests for weighted Voronoi stippling."""
+import numpy as np
+
+from src.utils.stipple import _lloyd_relax, weighted_voronoi_stipple
+
+
+def test_coincident_seeds_are_separated():
+    points = np.array([[10.3, 10.6], [10.3, 10.6]])
+    relaxed = _lloyd_relax(points, np.ones((20, 20)), 10, np.random.default_rng(0))
+    assert np.hypot(*(relaxed[0] - relaxed[1])) > 5
+
+
+def test_stipples_land_in_distinct_cells():
+    darkness = np.zeros((100, 100))
+    darkness[40:60, 40:60] = 1
+    points = weighted_voronoi_stipple(darkness, 200)
+    assert len(np.unique(points.astype(np.int64), axis=0)) == 200